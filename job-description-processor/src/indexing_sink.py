@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Buffered bulk indexing for the document processors
+Identical copies live in resume-processor/src and job-description-processor/src -
+change them together
+"""
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from opensearchpy import helpers
+
+logger = logging.getLogger()
+
+# Bulk response statuses worth retrying (throttling and server-side errors)
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+class IndexingSink:
+    """
+    Buffers documents and writes them with the bulk API
+
+    A buffer is flushed when it holds `max_docs` documents or `max_bytes` of
+    JSON, when a document arrives and the oldest buffered one is more than
+    `max_age_seconds` old, or explicitly with flush() - call it before the
+    invocation returns. Each add() returns a Future resolved with the document
+    id once it is indexed, or with the error of its bulk item.
+    """
+
+    def __init__(self, client_factory: Callable, max_docs: int = 100, max_bytes: int = 5 * 1024 * 1024,
+                 max_age_seconds: float = 5.0, max_retries: int = 3, backoff_seconds: float = 0.5):
+        self.client_factory = client_factory
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+
+        self._buffer: List[Dict] = []
+        self._buffer_bytes = 0
+        self._oldest: Optional[float] = None
+        self._lock = threading.Lock()  # guards the buffer
+        self._flush_lock = threading.Lock()  # one bulk request at a time
+
+    def add(self, index_name: str, doc_id: str, document: Dict) -> Future:
+        """Buffer a document for indexing, flushing when a threshold is reached"""
+        entry = {
+            'index': index_name,
+            'id': doc_id,
+            'source': document,
+            'size': len(json.dumps(document)),
+            'future': Future()
+        }
+
+        with self._lock:
+            self._buffer.append(entry)
+            self._buffer_bytes += entry['size']
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            full = (
+                len(self._buffer) >= self.max_docs
+                or self._buffer_bytes >= self.max_bytes
+                or time.monotonic() - self._oldest >= self.max_age_seconds
+            )
+
+        if full:
+            self.flush()
+        return entry['future']
+
+    def flush(self) -> None:
+        """Write every buffered document, retrying only the items that failed transiently"""
+        with self._flush_lock:
+            with self._lock:
+                batch = self._buffer
+                self._buffer = []
+                self._buffer_bytes = 0
+                self._oldest = None
+            if not batch:
+                return
+
+            start = time.perf_counter()
+            error = None
+            try:
+                self._write(batch)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                # Never leave a caller waiting on a document that was not written
+                for entry in batch:
+                    if not entry['future'].done():
+                        entry['future'].set_exception(error or RuntimeError('No bulk response for the document'))
+
+            logger.info(f"Bulk indexed {len(batch)} documents in {time.perf_counter() - start:.2f}s")
+
+    def _write(self, pending: List[Dict]) -> None:
+        """Bulk-write entries, resolving their futures; failed items are retried with backoff"""
+        client = self.client_factory()
+        total = len(pending)
+        attempt = 0
+        while pending:
+            retry = []
+            for entry, (ok, item) in zip(pending, self._bulk(client, pending)):
+                result = item.get('index', {})
+                if ok:
+                    entry['future'].set_result(result.get('_id', entry['id']))
+                elif self._retryable(result) and attempt < self.max_retries:
+                    retry.append(entry)
+                else:
+                    error = result.get('error') or result.get('exception') or 'bulk item failed'
+                    logger.error(f"Failed to index {entry['id']} into {entry['index']}: {error}")
+                    entry['future'].set_exception(RuntimeError(f"Bulk indexing failed: {error}"))
+
+            pending = retry
+            if pending:
+                attempt += 1
+                logger.warning(f"Retrying {len(pending)} of {total} bulk items (attempt {attempt})")
+                time.sleep(self.backoff_seconds * 2 ** (attempt - 1))
+
+    def _bulk(self, client, entries: List[Dict]):
+        """(ok, item) per entry, in entry order"""
+        actions = (
+            {'_op_type': 'index', '_index': entry['index'], '_id': entry['id'], '_source': entry['source']}
+            for entry in entries
+        )
+        return helpers.streaming_bulk(
+            client,
+            actions,
+            chunk_size=self.max_docs,
+            max_chunk_bytes=self.max_bytes,
+            raise_on_error=False,
+            raise_on_exception=False,
+            max_retries=0  # failed items are retried by _write()
+        )
+
+    def _retryable(self, result: Dict) -> bool:
+        """Throttled, server-side and connection failures are transient"""
+        status = result.get('status')
+        return 'exception' in result or not isinstance(status, int) or status in RETRYABLE_STATUSES
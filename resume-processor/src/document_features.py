@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Document features shared by the processors and the Similarity Search API
+Identical copies live in resume-processor/src, job-description-processor/src and
+similarity-search-api/src - change them together
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from Levenshtein import ratio as _indel_ratio
+except ImportError:
+    # The processors ship without python-Levenshtein; this computes the same value
+    def _indel_ratio(s1: str, s2: str) -> float:
+        """Levenshtein.ratio: 2 * LCS / combined length"""
+        previous = [0] * (len(s2) + 1)
+        for char1 in s1:
+            current = [0]
+            for j, char2 in enumerate(s2):
+                current.append(previous[j] + 1 if char1 == char2 else max(previous[j + 1], current[j]))
+            previous = current
+        return 2 * previous[-1] / (len(s1) + len(s2))
+
+def skill_ratio(s1: str, s2: str) -> int:
+    """
+    fuzz.ratio as computed with python-Levenshtein: rounded indel similarity from 0 to 100
+
+    One implementation everywhere, so a skill gets the same synonym categories
+    whether the processors or the API resolve it (difflib's SequenceMatcher,
+    fuzzywuzzy's fallback, disagrees near SYNONYM_MATCH_SCORE).
+    """
+    if s1 == s2:
+        return 100
+    if not s1 or not s2:
+        return 0
+    return int(round(100 * _indel_ratio(s1, s2)))
+
+# Skill synonym table: canonical skill ID -> equivalent skills
+SKILL_SYNONYMS = {
+    'python': ['python3', 'py', 'django', 'flask', 'fastapi', 'python programming'],
+    'javascript': ['js', 'node.js', 'nodejs', 'react', 'vue', 'angular', 'javascript programming'],
+    'java': ['j2ee', 'spring', 'springboot', 'hibernate', 'java programming'],
+    'aws': ['amazon web services', 'ec2', 'lambda', 's3', 'cloudformation', 'aws cloud'],
+    'machine learning': ['ml', 'ai', 'artificial intelligence', 'deep learning', 'neural networks'],
+    'docker': ['containerization', 'containers', 'kubernetes', 'k8s'],
+    'sql': ['mysql', 'postgresql', 'oracle', 'database', 'rdbms'],
+    'git': ['github', 'gitlab', 'version control', 'bitbucket'],
+    'linux': ['unix', 'ubuntu', 'centos', 'bash', 'shell scripting'],
+    'frontend': ['front-end', 'ui', 'user interface', 'web development'],
+    'backend': ['back-end', 'server-side', 'api development', 'microservices'],
+    'devops': ['ci/cd', 'jenkins', 'automation', 'infrastructure'],
+    'cloud': ['cloud computing', 'saas', 'paas', 'iaas'],
+    'agile': ['scrum', 'kanban', 'sprint planning', 'jira']
+}
+
+# Keywords used to classify industries and education requirements
+INDUSTRY_KEYWORDS = {
+    'tech': ['tech', 'software', 'it', 'digital', 'data', 'ai', 'ml'],
+    'finance': ['bank', 'finance', 'investment', 'trading', 'fintech'],
+    'healthcare': ['health', 'medical', 'pharma', 'hospital', 'clinic']
+}
+
+EDUCATION_KEYWORDS = ['degree', 'bachelor', 'master', 'phd', 'diploma', 'certification']
+
+# Ordinal degree levels; 0 means no recognized degree
+DEGREE_LEVELS = {'diploma': 1, 'bachelor': 2, 'master': 3, 'phd': 4}
+
+# A skill joins a category when skill_ratio against one of its synonyms reaches this
+SYNONYM_MATCH_SCORE = 85
+
+# Version of the stored `canonical_skills` entries; documents written with an older
+# version (categories resolved with difflib ratios) are re-resolved by the API
+CANONICAL_SKILLS_VERSION = 2
+
+def normalize_skill(skill) -> str:
+    """Normalized form used for skill comparisons"""
+    return str(skill).lower().strip()
+
+def skill_categories(skill: str, synonyms_table: Dict[str, List[str]] = SKILL_SYNONYMS) -> Tuple[str, ...]:
+    """
+    Canonical categories of a normalized skill, in table order
+
+    A skill belongs to a category when it is listed as a synonym or is a close
+    fuzzy match (>= SYNONYM_MATCH_SCORE) of one.
+    """
+    return tuple(
+        category for category, synonyms in synonyms_table.items()
+        if skill in synonyms or any(skill_ratio(skill, synonym) >= SYNONYM_MATCH_SCORE for synonym in synonyms)
+    )
+
+def canonicalize_skills(skills: List) -> Dict:
+    """
+    Build the `canonical_skills` field stored next to a document's metadata
+
+    Returns:
+        {'ids': sorted canonical IDs (normalized skills plus their categories),
+         'skills': sorted normalized skills,
+         'categories': sorted synonym categories,
+         'entries': one {'surface', 'normalized', 'categories'} per input skill, in order,
+         'version': CANONICAL_SKILLS_VERSION}
+    """
+    entries = []
+    skills_set = set()
+    categories_set = set()
+
+    for surface in skills or []:
+        normalized = normalize_skill(surface)
+        categories = list(skill_categories(normalized)) if normalized else []
+        entries.append({
+            'surface': surface,
+            'normalized': normalized,
+            'categories': categories
+        })
+        if normalized:
+            skills_set.add(normalized)
+        categories_set.update(categories)
+
+    return {
+        'ids': sorted(skills_set | categories_set),
+        'skills': sorted(skills_set),
+        'categories': sorted(categories_set),
+        'entries': entries,
+        'version': CANONICAL_SKILLS_VERSION
+    }
+
+def parse_experience_range(experience_level) -> Optional[Tuple[int, int]]:
+    """Parse a required experience string into a (min, max) years range"""
+    required_exp = str(experience_level or '').lower()
+
+    if 'entry' in required_exp or 'junior' in required_exp or '0-2' in required_exp:
+        return 0, 2
+    elif 'mid' in required_exp or 'intermediate' in required_exp or '2-5' in required_exp:
+        return 2, 5
+    elif 'senior' in required_exp or '5+' in required_exp or '5-10' in required_exp:
+        return 5, 10
+    elif 'lead' in required_exp or 'principal' in required_exp or '10+' in required_exp:
+        return 10, 20
+
+    # Try to extract numbers from experience string
+    numbers = re.findall(r'\d+', required_exp)
+    if len(numbers) >= 2:
+        return int(numbers[0]), int(numbers[1])
+    elif len(numbers) == 1:
+        return int(numbers[0]), int(numbers[0]) + 3
+
+    return None
+
+def degree_level(text: str) -> int:
+    """Highest degree level a lowercased degree string mentions (0 when none)"""
+    return max((level for keyword, level in DEGREE_LEVELS.items() if keyword in text), default=0)
+
+def required_degree_level(text: str) -> int:
+    """Lowest degree level a lowercased requirement string accepts (0 when none)"""
+    return min((level for keyword, level in DEGREE_LEVELS.items() if keyword in text), default=0)
+
+def education_requirements(job_requirements) -> List[str]:
+    """Lowercased job requirements that talk about education"""
+    requirements = []
+    for req in job_requirements or []:
+        req_lower = str(req).lower()
+        if any(keyword in req_lower for keyword in EDUCATION_KEYWORDS):
+            requirements.append(req_lower)
+    return requirements
+
+def resume_degrees(education) -> List[str]:
+    """Lowercased degrees of a resume's education entries (dicts or strings)"""
+    degrees = []
+    for edu in education or []:
+        if isinstance(edu, dict):
+            degree = (edu.get('degree') or '').lower()
+            if degree:
+                degrees.append(degree)
+        else:
+            degrees.append(str(edu).lower())
+    return degrees
+
+def job_industries(company_name, job_title) -> List[str]:
+    """Industries whose keywords appear in the company name or job title, in table order"""
+    company_name = str(company_name or '').lower()
+    job_title = str(job_title or '').lower()
+    return [
+        name for name, keywords in INDUSTRY_KEYWORDS.items()
+        if any(keyword in company_name or keyword in job_title for keyword in keywords)
+    ]
+
+def resume_industries(experience) -> List[str]:
+    """Industries some company/role pairing of the work history mentions, in table order"""
+    companies = []
+    roles = []
+    for exp in experience or []:
+        if isinstance(exp, dict):
+            company = (exp.get('company') or '').lower()
+            position = (exp.get('position') or '').lower()
+            if company:
+                companies.append(company)
+            if position:
+                roles.append(position)
+
+    return [
+        name for name, keywords in INDUSTRY_KEYWORDS.items()
+        if any(
+            any(keyword in company or keyword in role for keyword in keywords)
+            for company in companies for role in roles
+        )
+    ]
+
+def job_features(metadata: Dict) -> Dict:
+    """
+    Build the numeric/keyword fields stored next to a job description's metadata
+
+    Returns:
+        {'exp_min', 'exp_max': required years (None when unparseable),
+         'degree_level': lowest degree level the education requirements accept (0 when none),
+         'industry_tags': industries of the company/title, primary industry first}
+    """
+    experience_range = parse_experience_range(metadata.get('experience_level'))
+    levels = [level for level in map(required_degree_level, education_requirements(metadata.get('job_requirements')))
+              if level]
+
+    return {
+        'exp_min': experience_range[0] if experience_range else None,
+        'exp_max': experience_range[1] if experience_range else None,
+        'degree_level': min(levels, default=0),
+        'industry_tags': job_industries(metadata.get('company_name'), metadata.get('job_title'))
+    }
+
+def resume_features(metadata: Dict) -> Dict:
+    """
+    Build the numeric/keyword fields stored next to a resume's metadata
+
+    Returns:
+        {'experience_years': total years as a number,
+         'degree_level': highest degree level held (0 when none),
+         'has_education': True when any degree is listed,
+         'industry_tags': industries of the work history,
+         'has_experience': True when any work history is listed}
+    """
+    try:
+        experience_years = float(metadata.get('total_experience_years') or 0)
+    except (TypeError, ValueError):
+        experience_years = 0.0
+
+    degrees = resume_degrees(metadata.get('education'))
+
+    return {
+        'experience_years': experience_years,
+        'degree_level': max(map(degree_level, degrees), default=0),
+        'has_education': bool(degrees),
+        'industry_tags': resume_industries(metadata.get('experience')),
+        'has_experience': bool(metadata.get('experience'))
+    }
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Offline gazetteer: normalized city names -> coordinates
+Identical copies live in resume-processor/src, job-description-processor/src and
+similarity-search-api/src - change them together
+"""
+
+from typing import Dict, Optional, Tuple
+
+# A location mentioning one of these is open to remote work
+REMOTE_KEYWORDS = ('remote', 'anywhere')
+
+# Canonical city -> (latitude, longitude)
+CITY_COORDINATES: Dict[str, Tuple[float, float]] = {
+    # India - metros
+    'mumbai': (19.0760, 72.8777),
+    'delhi': (28.7041, 77.1025),
+    'bangalore': (12.9716, 77.5946),
+    'hyderabad': (17.3850, 78.4867),
+    'chennai': (13.0827, 80.2707),
+    'pune': (18.5204, 73.8567),
+    'kolkata': (22.5726, 88.3639),
+    'ahmedabad': (23.0225, 72.5714),
+    # India - NCR and satellite cities
+    'noida': (28.5355, 77.3910),
+    'gurgaon': (28.4595, 77.0266),
+    'ghaziabad': (28.6692, 77.4538),
+    'faridabad': (28.4089, 77.3178),
+    'navi mumbai': (19.0330, 73.0297),
+    'thane': (19.2183, 72.9781),
+    # India - other tech and regional hubs
+    'lucknow': (26.8467, 80.9462),
+    'jaipur': (26.9124, 75.7873),
+    'chandigarh': (30.7333, 76.7794),
+    'indore': (22.7196, 75.8577),
+    'bhopal': (23.2599, 77.4126),
+    'nagpur': (21.1458, 79.0882),
+    'surat': (21.1702, 72.8311),
+    'vadodara': (22.3072, 73.1812),
+    'kochi': (9.9312, 76.2673),
+    'thiruvananthapuram': (8.5241, 76.9366),
+    'coimbatore': (11.0168, 76.9558),
+    'mysore': (12.2958, 76.6394),
+    'mangalore': (12.9141, 74.8560),
+    'visakhapatnam': (17.6868, 83.2185),
+    'bhubaneswar': (20.2961, 85.8245),
+    'patna': (25.5941, 85.1376),
+    'kanpur': (26.4499, 80.3319),
+    'varanasi': (25.3176, 82.9739),
+    'prayagraj': (25.4358, 81.8463),
+    'dehradun': (30.3165, 78.0322),
+    'guwahati': (26.1445, 91.7362),
+    'panaji': (15.4909, 73.8278),
+    # International
+    'singapore': (1.3521, 103.8198),
+    'dubai': (25.2048, 55.2708),
+    'london': (51.5074, -0.1278),
+    'berlin': (52.5200, 13.4050),
+    'new york': (40.7128, -74.0060),
+    'san francisco': (37.7749, -122.4194),
+    'seattle': (47.6062, -122.3321),
+    'toronto': (43.6532, -79.3832),
+    'sydney': (-33.8688, 151.2093)
+}
+
+# Alternative spellings and former names -> canonical city
+CITY_ALIASES: Dict[str, str] = {
+    'bengaluru': 'bangalore',
+    'new delhi': 'delhi',
+    'delhi ncr': 'delhi',
+    'ncr': 'delhi',
+    'bombay': 'mumbai',
+    'madras': 'chennai',
+    'calcutta': 'kolkata',
+    'gurugram': 'gurgaon',
+    'trivandrum': 'thiruvananthapuram',
+    'cochin': 'kochi',
+    'mysuru': 'mysore',
+    'mangaluru': 'mangalore',
+    'vizag': 'visakhapatnam',
+    'allahabad': 'prayagraj',
+    'baroda': 'vadodara',
+    'goa': 'panaji',
+    'new york city': 'new york',
+    'nyc': 'new york',
+    'sf': 'san francisco'
+}
+
+# Every accepted name -> canonical city
+CITY_LOOKUP: Dict[str, str] = {**{city: city for city in CITY_COORDINATES}, **CITY_ALIASES}
+
+def location_key(location) -> str:
+    """Normalized city part of a free-text location ("Pune, India" -> "pune")"""
+    return str(location or '').lower().split(',')[0].strip()
+
+def resolve_city(location) -> Optional[str]:
+    """Canonical gazetteer city of a free-text location, or None when unknown"""
+    return CITY_LOOKUP.get(location_key(location))
+
+def city_coordinates(location) -> Optional[Tuple[float, float]]:
+    """(latitude, longitude) of a free-text location, or None when unknown"""
+    city = resolve_city(location)
+    return CITY_COORDINATES[city] if city else None
+
+def location_features(location) -> Dict:
+    """
+    Build the location fields stored next to a document's metadata
+
+    Returns:
+        {'geo_location': {'lat', 'lon'} of the gazetteer city or None when unknown,
+         'is_remote': True when the location mentions remote work,
+         'location_normalized': lowercased, stripped location as used by the matcher}
+    """
+    coordinates = city_coordinates(location)
+    location_normalized = str(location or '').strip().lower()
+
+    return {
+        'geo_location': {'lat': coordinates[0], 'lon': coordinates[1]} if coordinates else None,
+        'is_remote': any(keyword in location_normalized for keyword in REMOTE_KEYWORDS),
+        'location_normalized': location_normalized
+    }
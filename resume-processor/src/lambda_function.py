@@ -1,55 +1,179 @@
+import hashlib
 import json
 import boto3
 import logging
 import os
+import threading
+import time
 from urllib.parse import unquote_plus
-import uuid
 from datetime import datetime
 import PyPDF2
 import io
+from concurrent.futures import FIRST_EXCEPTION, Future, ThreadPoolExecutor, wait
+from botocore.config import Config
+from document_features import canonicalize_skills, resume_features
+from gazetteer import location_features
+from indexing_sink import IndexingSink
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# S3 records processed at once; each runs two Bedrock calls, so this is the knob
+# to tune against the account's Bedrock request quotas
+MAX_CONCURRENT_RECORDS = int(os.environ.get('MAX_CONCURRENT_RECORDS', '4'))
+
+# Per-stage timeouts of the concurrent Bedrock calls (see run_bedrock_stages)
+METADATA_TIMEOUT_SECONDS = float(os.environ.get('METADATA_TIMEOUT_SECONDS', '60'))
+EMBEDDING_TIMEOUT_SECONDS = float(os.environ.get('EMBEDDING_TIMEOUT_SECONDS', '30'))
+BEDROCK_MAX_WORKERS = int(os.environ.get('BEDROCK_MAX_WORKERS', str(2 * MAX_CONCURRENT_RECORDS)))
+# Attempts per Bedrock call (1 = no client retries; failed records are retried by
+# the async invocation instead), each bounded by its share of the stage timeout
+BEDROCK_MAX_ATTEMPTS = int(os.environ.get('BEDROCK_MAX_ATTEMPTS', '1'))
+BEDROCK_CONNECT_TIMEOUT_SECONDS = 5
+
 # Initialize AWS clients
 s3_client = boto3.client('s3')
-bedrock_runtime = boto3.client('bedrock-runtime', region_name='us-east-1')
 opensearch_client = boto3.client('opensearch', region_name='us-east-1')
 
+def bedrock_client(timeout_seconds):
+    """
+    Bedrock runtime client whose calls, retries included, end with their stage
+    
+    A call that outlives its stage timeout is abandoned by run_bedrock_stages but
+    keeps running in the background; botocore's own retries would extend it well
+    past the stage, so every attempt gets its share of the stage timeout.
+    """
+    return boto3.client(
+        'bedrock-runtime',
+        region_name='us-east-1',
+        config=Config(
+            connect_timeout=BEDROCK_CONNECT_TIMEOUT_SECONDS,
+            read_timeout=max(1, int(timeout_seconds / BEDROCK_MAX_ATTEMPTS)),
+            retries={'total_max_attempts': BEDROCK_MAX_ATTEMPTS, 'mode': 'standard'},
+            max_pool_connections=BEDROCK_MAX_WORKERS
+        )
+    )
+
+# One client per stage, with timeouts sized to that stage
+bedrock_metadata_runtime = bedrock_client(METADATA_TIMEOUT_SECONDS)
+bedrock_embedding_runtime = bedrock_client(EMBEDDING_TIMEOUT_SECONDS)
+
+# Bulk indexing buffer (see IndexingSink): flushed by count, bytes or age, and
+# at the end of every invocation
+BULK_MAX_DOCS = int(os.environ.get('BULK_MAX_DOCS', '100'))
+BULK_MAX_BYTES = int(os.environ.get('BULK_MAX_MB', '5')) * 1024 * 1024
+BULK_MAX_AGE_SECONDS = float(os.environ.get('BULK_MAX_AGE_SECONDS', '5'))
+BULK_MAX_RETRIES = int(os.environ.get('BULK_MAX_RETRIES', '3'))
+
+# Threads for the records of an event and for their concurrent metadata/embedding
+# calls, reused across warm invocations
+record_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_RECORDS)
+bedrock_executor = ThreadPoolExecutor(max_workers=BEDROCK_MAX_WORKERS)
+
+INDEX_NAME = 'resumes'
+
+# Field mappings of the resumes index
+INDEX_PROPERTIES = {
+    'file_name': {'type': 'keyword'},
+    'text_content': {'type': 'text'},
+    'metadata': {'type': 'object'},
+    'canonical_skills': {
+        'properties': {
+            'ids': {'type': 'keyword'},
+            'skills': {'type': 'keyword'},
+            'categories': {'type': 'keyword'},
+            'entries': {'type': 'object', 'enabled': False},
+            'version': {'type': 'integer'}
+        }
+    },
+    'geo_location': {'type': 'geo_point'},
+    'is_remote': {'type': 'boolean'},
+    'location_normalized': {'type': 'keyword'},
+    'experience_years': {'type': 'float'},
+    'degree_level': {'type': 'integer'},
+    'has_education': {'type': 'boolean'},
+    'industry_tags': {'type': 'keyword'},
+    'has_experience': {'type': 'boolean'},
+    'embeddings': {'type': 'knn_vector', 'dimension': 1536},
+    'processed_at': {'type': 'date'},
+    'document_type': {'type': 'keyword'}
+}
+
+# Fields added after the index was first created; mapped on existing indices
+ADDED_FIELDS = [
+    'canonical_skills', 'geo_location', 'is_remote', 'location_normalized',
+    'experience_years', 'degree_level', 'has_education', 'industry_tags', 'has_experience'
+]
+
+# Added fields whose queries fail or silently miss when dynamically mapped
+TYPED_FIELDS = {
+    'geo_location': 'geo_point',  # geo_distance needs geo_point, not a {lat, lon} object
+    'canonical_skills.ids': 'keyword'  # terms filters match whole IDs, not analyzed text
+}
+
+# Indices already created or upgraded by this container
+ensured_indices = set()
+ensured_indices_lock = threading.Lock()  # records are indexed from several threads
+
+# Content IDs claimed by the records of the current invocation, each with a Future
+# of the claiming record's outcome (see claim_document)
+claimed_ids = {}
+claimed_ids_lock = threading.Lock()
+
+# Shared OpenSearch data client (see get_opensearch_client)
+opensearch_data_client = None
+opensearch_data_client_lock = threading.Lock()
+
 def lambda_handler(event, context):
     """
     Main Lambda handler function that processes resume PDFs uploaded to S3
+    
+    Records of the event are processed concurrently (at most MAX_CONCURRENT_RECORDS
+    at a time) and reported one by one.
     """
     try:
         logger.info(f"Received event: {json.dumps(event)}")
         
-        # Process each S3 record in the event
-        for record in event['Records']:
-            # Extract S3 bucket and object information
-            bucket_name = record['s3']['bucket']['name']
-            object_key = unquote_plus(record['s3']['object']['key'])
-            
-            logger.info(f"Processing file: {object_key} from bucket: {bucket_name}")
-            
-            # Skip if not a PDF file
-            if not object_key.lower().endswith('.pdf'):
-                logger.warning(f"Skipping non-PDF file: {object_key}")
+        results = list(record_executor.map(process_record, event['Records']))
+        
+        # Documents are written in bulk; report a record as processed only once it is indexed
+        try:
+            indexing_sink.flush()
+        except Exception as e:
+            logger.error(f"Error flushing bulk indexing buffer: {str(e)}")
+        for result in results:
+            if result['status'] == 'duplicate':
                 continue
-            
-            # Process the resume PDF
-            result = process_resume_pdf(bucket_name, object_key)
-            
-            if result['success']:
-                logger.info(f"Successfully processed resume: {object_key}")
-            else:
-                logger.error(f"Failed to process resume: {object_key}. Error: {result['error']}")
+            indexed = result.pop('indexed', None)
+            if indexed is not None and indexed.exception() is not None:
+                result['status'] = 'failed'
+                result['error'] = str(indexed.exception())
+                result.pop('opensearch_id', None)
+        
+        # A duplicate of content claimed in this invocation shares its claimant's outcome
+        release_claims(results)
+        for result in results:
+            first_claim = result.pop('indexed', None)
+            if first_claim is not None and first_claim.exception() is not None:
+                result['status'] = 'failed'
+                result['error'] = str(first_claim.exception())
+                result.pop('opensearch_id', None)
+        
+        processed = sum(1 for result in results if result['status'] == 'processed')
+        failed = sum(1 for result in results if result['status'] == 'failed')
+        skipped = sum(1 for result in results if result['status'] == 'skipped')
+        duplicates = sum(1 for result in results if result['status'] == 'duplicate')
         
         return {
-            'statusCode': 200,
+            'statusCode': 200 if not failed else 207,
             'body': json.dumps({
                 'message': 'Resume processing completed',
-                'processed_files': len(event['Records'])
+                'processed_files': processed,
+                'failed_files': failed,
+                'skipped_files': skipped,
+                'duplicate_files': duplicates,
+                'results': results
             })
         }
         
@@ -62,6 +186,57 @@ def lambda_handler(event, context):
                 'message': str(e)
             })
         }
+    
+    finally:
+        # Claims never outlive the invocation, even a failed one
+        release_claims()
+
+def process_record(record):
+    """
+    Process the object of one S3 event record
+    
+    Returns:
+        {'object_key', 'status': 'processed', 'duplicate', 'skipped' or 'failed',
+         plus 'opensearch_id' (processed, duplicate), 'reason' (skipped) or 'error' (failed)}
+    """
+    try:
+        # Extract S3 bucket and object information
+        bucket_name = record['s3']['bucket']['name']
+        object_key = unquote_plus(record['s3']['object']['key'])
+    except (KeyError, TypeError) as e:
+        logger.error(f"Malformed S3 record: {str(e)}")
+        return {'object_key': None, 'status': 'failed', 'error': f'Malformed S3 record: {str(e)}'}
+    
+    logger.info(f"Processing file: {object_key} from bucket: {bucket_name}")
+    
+    # Skip if not a PDF file
+    if not object_key.lower().endswith('.pdf'):
+        logger.warning(f"Skipping non-PDF file: {object_key}")
+        return {'object_key': object_key, 'status': 'skipped', 'reason': 'Not a PDF file'}
+    
+    # Process the resume PDF
+    result = process_resume_pdf(bucket_name, object_key)
+    
+    if result.get('duplicate'):
+        logger.info(f"Skipped already indexed content: {object_key} ({result['opensearch_id']})")
+        return {
+            'object_key': object_key,
+            'status': 'duplicate',
+            'opensearch_id': result['opensearch_id'],
+            'indexed': result.get('indexed')
+        }
+    
+    if result['success']:
+        logger.info(f"Successfully processed resume: {object_key}")
+        return {
+            'object_key': object_key,
+            'status': 'processed',
+            'opensearch_id': result.get('opensearch_id'),
+            'indexed': result.get('indexed')
+        }
+    
+    logger.error(f"Failed to process resume: {object_key}. Error: {result['error']}")
+    return {'object_key': object_key, 'status': 'failed', 'error': result['error']}
 
 def process_resume_pdf(bucket_name, object_key):
     """
@@ -72,6 +247,12 @@ def process_resume_pdf(bucket_name, object_key):
         logger.info(f"Downloading PDF: {object_key}")
         pdf_content = download_pdf_from_s3(bucket_name, object_key)
         
+        # Identical content is one document; skip all work for content already indexed
+        doc_id = content_document_id(pdf_content)
+        claimed, first_claim = claim_document(doc_id)
+        if not claimed:
+            return {'success': True, 'duplicate': True, 'opensearch_id': doc_id, 'indexed': first_claim}
+        
         # Step 2: Extract text from PDF
         logger.info(f"Extracting text from PDF: {object_key}")
         extracted_text = extract_text_from_pdf(pdf_content)
@@ -82,18 +263,21 @@ def process_resume_pdf(bucket_name, object_key):
                 'error': 'No text could be extracted from PDF'
             }
         
-        # Step 3: Extract structured metadata using Claude 3 Haiku
-        logger.info(f"Extracting metadata using Bedrock: {object_key}")
-        metadata = extract_metadata_with_bedrock(extracted_text)
-        
-        # Step 4: Generate embeddings using Titan
-        logger.info(f"Generating embeddings: {object_key}")
-        embeddings = generate_embeddings_with_titan(extracted_text)
+        # Steps 3-4: Extract structured metadata using Claude 3 Haiku and generate
+        # embeddings using Titan - independent calls, so they run concurrently
+        logger.info(f"Extracting metadata and generating embeddings using Bedrock: {object_key}")
+        results = run_bedrock_stages(object_key, {
+            'metadata': (extract_metadata_with_bedrock, extracted_text, METADATA_TIMEOUT_SECONDS),
+            'embeddings': (generate_embeddings_with_titan, extracted_text, EMBEDDING_TIMEOUT_SECONDS)
+        })
+        metadata = results['metadata']
+        embeddings = results['embeddings']
         
         # Step 5: Store in OpenSearch
         logger.info(f"Storing in OpenSearch: {object_key}")
         opensearch_result = store_in_opensearch(
             object_key, 
+            doc_id,
             extracted_text, 
             metadata, 
             embeddings
@@ -102,7 +286,8 @@ def process_resume_pdf(bucket_name, object_key):
         return {
             'success': True,
             'metadata': metadata,
-            'opensearch_id': opensearch_result.get('_id')
+            'opensearch_id': opensearch_result.get('_id'),
+            'indexed': opensearch_result.get('indexed')
         }
         
     except Exception as e:
@@ -112,6 +297,119 @@ def process_resume_pdf(bucket_name, object_key):
             'error': str(e)
         }
 
+def run_bedrock_stages(object_key, stages):
+    """
+    Run independent Bedrock calls concurrently, each with its own timeout
+
+    Args:
+        object_key: S3 key of the document, for logging
+        stages: {name: (function, text, timeout in seconds)}
+
+    Returns:
+        {name: result}
+
+    The first stage to fail or time out cancels the stages that have not
+    started yet and its error is raised; a call already in flight finishes in
+    the background, bounded by its stage's client (see bedrock_client), and is
+    discarded.
+    """
+    start = time.perf_counter()
+    elapsed = {}
+
+    def timed(name, function, text):
+        stage_start = time.perf_counter()
+        try:
+            return function(text)
+        finally:
+            elapsed[name] = time.perf_counter() - stage_start
+
+    futures = {
+        bedrock_executor.submit(timed, name, function, text): (name, start + timeout)
+        for name, (function, text, timeout) in stages.items()
+    }
+    pending = set(futures)
+
+    try:
+        while pending:
+            next_deadline = min(futures[future][1] for future in pending)
+            done, pending = wait(
+                pending,
+                timeout=max(0.0, next_deadline - time.perf_counter()),
+                return_when=FIRST_EXCEPTION
+            )
+            for future in done:
+                if future.exception() is not None:
+                    raise future.exception()
+            for future in pending:
+                name, deadline = futures[future]
+                if time.perf_counter() >= deadline:
+                    raise TimeoutError(f"Bedrock stage '{name}' did not finish within {stages[name][2]}s")
+    except Exception:
+        for future in pending:
+            future.cancel()
+        raise
+
+    logger.info(
+        f"Bedrock stages for {object_key}: "
+        + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in sorted(elapsed.items()))
+        + f", wall {time.perf_counter() - start:.2f}s"
+    )
+    return {futures[future][0]: future.result() for future in futures}
+
+def content_document_id(content):
+    """
+    Document ID of an uploaded object: the SHA-256 of its raw bytes
+    
+    Re-uploads and retried events of the same content map to one document.
+    """
+    return hashlib.sha256(content).hexdigest()
+
+def claim_document(doc_id):
+    """
+    Reserve a content ID for the current record
+    
+    A duplicate is already indexed or claimed by another record of the current
+    invocation. When the index cannot be checked the document is processed
+    again, which is safe since indexing the same ID overwrites it.
+    
+    Returns:
+        (claimed, first_claim): claimed is False for a duplicate; first_claim is the
+        Future of the claiming record's outcome when it is a record of this invocation
+    """
+    claim = Future()
+    with claimed_ids_lock:
+        if doc_id in claimed_ids:
+            return False, claimed_ids[doc_id]
+        claimed_ids[doc_id] = claim
+    
+    try:
+        if get_opensearch_client().exists(index=INDEX_NAME, id=doc_id):
+            # Later records with this content are duplicates of the indexed document
+            claim.set_result(doc_id)
+            return False, None
+    except Exception as e:
+        logger.warning(f"Could not check whether {doc_id} is already indexed: {str(e)}")
+    return True, None
+
+def release_claims(results=None):
+    """
+    Resolve and forget the content IDs claimed in this invocation
+    
+    A claim resolves with the document ID once its record is reported as
+    processed in `results`, and fails otherwise.
+    """
+    indexed_ids = {result['opensearch_id'] for result in results or [] if result['status'] == 'processed'}
+    
+    with claimed_ids_lock:
+        for doc_id, claim in claimed_ids.items():
+            if claim.done():
+                continue
+            if doc_id in indexed_ids:
+                claim.set_result(doc_id)
+            else:
+                claim.set_exception(RuntimeError(f"The first record with this content was not indexed ({doc_id})"))
+        claimed_ids.clear()
+
 def download_pdf_from_s3(bucket_name, object_key):
     """
     Download PDF file from S3 bucket
@@ -182,7 +480,7 @@ def extract_metadata_with_bedrock(text):
             ]
         })
 
-        response = bedrock_runtime.invoke_model(
+        response = bedrock_metadata_runtime.invoke_model(
             modelId=model_id,
             body=body,
             contentType='application/json'
@@ -230,7 +528,7 @@ def generate_embeddings_with_titan(text):
             "inputText": text
         })
         
-        response = bedrock_runtime.invoke_model(
+        response = bedrock_embedding_runtime.invoke_model(
             modelId=model_id,
             body=body,
             contentType='application/json'
@@ -245,66 +543,150 @@ def generate_embeddings_with_titan(text):
         logger.error(f"Error generating embeddings with Titan: {str(e)}")
         raise
 
-def store_in_opensearch(object_key, text, metadata, embeddings):
+def get_opensearch_client():
+    """
+    OpenSearch client for data operations, shared by every record and invocation
+    
+    Created on first use. Its keep-alive connection pool survives across warm
+    invocations, and each request is signed with the execution role's
+    refreshable credentials, so the client outlives credential rotation.
+    """
+    global opensearch_data_client
+    
+    with opensearch_data_client_lock:
+        if opensearch_data_client is None:
+            # Get OpenSearch endpoint from environment variables
+            opensearch_endpoint = os.environ.get('OPENSEARCH_ENDPOINT')
+            if not opensearch_endpoint:
+                raise ValueError("OPENSEARCH_ENDPOINT environment variable not set")
+            
+            from opensearchpy import OpenSearch, RequestsAWSV4SignerAuth, RequestsHttpConnection
+            
+            # The botocore credentials object refreshes itself before expiry
+            credentials = boto3.Session().get_credentials()
+            
+            opensearch_data_client = OpenSearch(
+                hosts=[{'host': opensearch_endpoint.replace('https://', ''), 'port': 443}],
+                http_auth=RequestsAWSV4SignerAuth(credentials, 'us-east-1', 'es'),
+                use_ssl=True,
+                verify_certs=True,
+                connection_class=RequestsHttpConnection,
+                pool_maxsize=MAX_CONCURRENT_RECORDS
+            )
+            logger.info(f"Created OpenSearch client for {opensearch_endpoint}")
+        
+        return opensearch_data_client
+
+# Shared bulk indexing buffer, writing through the shared client
+indexing_sink = IndexingSink(
+    get_opensearch_client,
+    max_docs=BULK_MAX_DOCS,
+    max_bytes=BULK_MAX_BYTES,
+    max_age_seconds=BULK_MAX_AGE_SECONDS,
+    max_retries=BULK_MAX_RETRIES
+)
+
+def store_in_opensearch(object_key, doc_id, text, metadata, embeddings):
     """
     Store the processed resume data in OpenSearch
     """
     try:
-        # Get OpenSearch endpoint from environment variables
-        opensearch_endpoint = os.environ.get('OPENSEARCH_ENDPOINT')
-        if not opensearch_endpoint:
-            raise ValueError("OPENSEARCH_ENDPOINT environment variable not set")
-        
-        # Create OpenSearch client for data operations
-        from opensearchpy import OpenSearch, RequestsHttpConnection
-        from aws_requests_auth.aws_auth import AWSRequestsAuth
-        
-        # Get AWS credentials for OpenSearch authentication
-        credentials = boto3.Session().get_credentials()
-        awsauth = AWSRequestsAuth(
-            aws_access_key=credentials.access_key,
-            aws_secret_access_key=credentials.secret_key,
-            aws_token=credentials.token,
-            aws_region='us-east-1',
-            aws_service='es',
-            aws_host=opensearch_endpoint
-        )
-        
-        opensearch_data_client = OpenSearch(
-            hosts=[{'host': opensearch_endpoint.replace('https://', ''), 'port': 443}],
-            http_auth=awsauth,
-            use_ssl=True,
-            verify_certs=True,
-            connection_class=RequestsHttpConnection
-        )
+        opensearch_data_client = get_opensearch_client()
         
         # Prepare document for indexing
         document = {
             'file_name': object_key,
             'text_content': text,
             'metadata': metadata,
+            'canonical_skills': canonicalize_skills(metadata.get('skills', [])),
+            **location_features(metadata.get('location')),
+            **resume_features(metadata),
             'embeddings': embeddings,
             'processed_at': datetime.utcnow().isoformat(),
             'document_type': 'resume'
         }
         
         # Index the document
-        index_name = 'resumes'
-        doc_id = str(uuid.uuid4())
+        ensure_index(opensearch_data_client, INDEX_NAME)
         
-        response = opensearch_data_client.index(
-            index=index_name,
-            id=doc_id,
-            body=document
-        )
+        # Buffered; written by the next bulk flush
+        indexed = indexing_sink.add(INDEX_NAME, doc_id, document)
         
-        logger.info(f"Successfully stored document in OpenSearch: {doc_id}")
-        return response
+        logger.info(f"Queued document for bulk indexing in OpenSearch: {doc_id}")
+        return {'_id': doc_id, 'indexed': indexed}
         
     except Exception as e:
         logger.error(f"Error storing in OpenSearch: {str(e)}")
         raise
 
+def ensure_index(client, index_name):
+    """
+    Create the index if it doesn't exist, or map fields added since it was created
+    
+    Runs once per index per warm container.
+    """
+    with ensured_indices_lock:
+        if index_name in ensured_indices:
+            return
+        
+        if not client.indices.exists(index=index_name):
+            index_body = {
+                'settings': {
+                    'index': {
+                        'number_of_shards': 1,
+                        'number_of_replicas': 1,
+                        'knn': True  # Required for k-NN candidate retrieval
+                    }
+                },
+                'mappings': {
+                    'properties': INDEX_PROPERTIES
+                }
+            }
+            client.indices.create(index=index_name, body=index_body)
+            logger.info(f"Created new OpenSearch index: {index_name}")
+        else:
+            try:
+                client.indices.put_mapping(
+                    index=index_name,
+                    body={'properties': {field: INDEX_PROPERTIES[field] for field in ADDED_FIELDS}}
+                )
+            except Exception as e:
+                mistyped = mistyped_fields(client, index_name)
+                if mistyped:
+                    # An existing field can't change type; only a reindex fixes it
+                    logger.error(f"{index_name} maps {', '.join(mistyped)} with the wrong type: {str(e)}")
+                    raise RuntimeError(
+                        f"{index_name} maps {', '.join(mistyped)} with the wrong type; reindex it "
+                        f"(docs/opensearch_devtools_command.md, section 17c)"
+                    ) from e
+                # Only fields that tolerate it were left with their dynamic mapping
+                logger.warning(f"Could not update mappings of {index_name}: {str(e)}")
+        
+        ensured_indices.add(index_name)
+
+def mistyped_fields(client, index_name):
+    """
+    List the TYPED_FIELDS of an index that are unmapped or mapped with another type
+    
+    Args:
+        client: OpenSearch client
+        index_name: Index (or alias) to inspect
+    
+    Returns:
+        list: Names of the fields whose mapping differs from TYPED_FIELDS
+    """
+    response = client.indices.get_field_mapping(index=index_name, fields=list(TYPED_FIELDS))
+    mistyped = []
+    for field, expected in TYPED_FIELDS.items():
+        leaf = field.rsplit('.', 1)[-1]
+        types = {
+            mappings.get('mappings', {}).get(field, {}).get('mapping', {}).get(leaf, {}).get('type')
+            for mappings in response.values()
+        } or {None}
+        if types != {expected}:
+            mistyped.append(field)
+    return mistyped
+
 # Optional: Health check function for testing
 def health_check():
     """
@@ -315,7 +697,7 @@ def health_check():
         s3_client.list_buckets()
         
         # Test Bedrock connectivity
-        bedrock_runtime.list_foundation_models()
+        bedrock_metadata_runtime.list_foundation_models()
         
         return {
             'status': 'healthy',
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+@pytest.fixture(autouse=True)
+def fresh_indices():
+    """Forget the indices ensured by earlier tests"""
+    import lambda_function
+    lambda_function.ensured_indices.clear()
+    yield
+    lambda_function.ensured_indices.clear()
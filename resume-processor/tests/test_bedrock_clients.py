@@ -0,0 +1,27 @@
+"""
+Timeouts and retries of the per-stage Bedrock clients
+"""
+
+from lambda_function import (
+    BEDROCK_MAX_ATTEMPTS, EMBEDDING_TIMEOUT_SECONDS, METADATA_TIMEOUT_SECONDS, bedrock_client,
+    bedrock_embedding_runtime, bedrock_metadata_runtime
+)
+
+def attempt_budget(client):
+    """Longest time the client can spend on one call, over all of its attempts"""
+    config = client.meta.config
+    return config.retries['total_max_attempts'] * (config.connect_timeout + config.read_timeout)
+
+def test_each_stage_client_is_sized_to_its_stage():
+    assert bedrock_metadata_runtime.meta.config.read_timeout == int(METADATA_TIMEOUT_SECONDS / BEDROCK_MAX_ATTEMPTS)
+    assert bedrock_embedding_runtime.meta.config.read_timeout == int(EMBEDDING_TIMEOUT_SECONDS / BEDROCK_MAX_ATTEMPTS)
+
+def test_retries_stay_within_the_stage_timeout():
+    client = bedrock_client(30)
+    config = client.meta.config
+
+    # total_max_attempts counts the first call; botocore's max_attempts counts retries only
+    assert config.retries == {'total_max_attempts': BEDROCK_MAX_ATTEMPTS, 'mode': 'standard'}
+    assert config.retries['total_max_attempts'] * config.read_timeout <= 30
+    # Connecting is the only time on top of the stage timeout
+    assert attempt_budget(client) <= 30 + BEDROCK_MAX_ATTEMPTS * config.connect_timeout
@@ -0,0 +1,62 @@
+"""
+Index creation and mapping upgrades, against a mocked OpenSearch client
+"""
+
+from unittest import mock
+
+import pytest
+
+from lambda_function import INDEX_NAME, ensure_index, ensured_indices
+
+def existing_index(field_types):
+    client = mock.MagicMock()
+    client.indices.exists.return_value = True
+    client.indices.put_mapping.side_effect = RuntimeError('mapper [geo_location] cannot be changed')
+    client.indices.get_field_mapping.return_value = {
+        f'{INDEX_NAME}_v1': {'mappings': {
+            field: {'full_name': field, 'mapping': {field.rsplit('.', 1)[-1]: mapping}}
+            for field, mapping in field_types.items()
+        }}
+    }
+    return client
+
+def test_new_index_is_created_with_knn():
+    client = mock.MagicMock()
+    client.indices.exists.return_value = False
+
+    ensure_index(client, INDEX_NAME)
+
+    body = client.indices.create.call_args.kwargs['body']
+    assert body['settings']['index']['knn'] is True
+    assert body['mappings']['properties']['geo_location'] == {'type': 'geo_point'}
+    assert INDEX_NAME in ensured_indices
+
+def test_dynamic_geo_location_fails_instead_of_warning():
+    client = existing_index({
+        'geo_location': {'properties': {'lat': {'type': 'float'}, 'lon': {'type': 'float'}}},
+        'canonical_skills.ids': {'type': 'keyword'}
+    })
+
+    with pytest.raises(RuntimeError, match='geo_location'):
+        ensure_index(client, INDEX_NAME)
+    # Not marked ensured, so every record keeps failing until the index is reindexed
+    assert INDEX_NAME not in ensured_indices
+
+def test_text_skill_ids_fail_instead_of_warning():
+    client = existing_index({
+        'geo_location': {'type': 'geo_point'},
+        'canonical_skills.ids': {'type': 'text'}
+    })
+
+    with pytest.raises(RuntimeError, match='canonical_skills.ids'):
+        ensure_index(client, INDEX_NAME)
+
+def test_mapping_failure_on_other_fields_only_warns():
+    client = existing_index({
+        'geo_location': {'type': 'geo_point'},
+        'canonical_skills.ids': {'type': 'keyword'}
+    })
+
+    ensure_index(client, INDEX_NAME)
+
+    assert INDEX_NAME in ensured_indices
@@ -0,0 +1,106 @@
+"""
+Bulk writes of IndexingSink, against a stubbed streaming_bulk
+Identical copies live in resume-processor/tests and job-description-processor/tests -
+change them together
+"""
+
+from unittest import mock
+
+import pytest
+
+import indexing_sink
+from indexing_sink import IndexingSink
+
+class StubBulk:
+    """
+    Stands in for helpers.streaming_bulk, answering each document with the next
+    of its scripted outcomes: an HTTP status, or an exception of the connection
+    """
+
+    def __init__(self, outcomes):
+        self.outcomes = {doc_id: list(statuses) for doc_id, statuses in outcomes.items()}
+        self.requests = []
+
+    def __call__(self, client, actions, **kwargs):
+        assert kwargs['raise_on_error'] is False and kwargs['max_retries'] == 0
+        actions = list(actions)
+        self.requests.append([action['_id'] for action in actions])
+        for action in actions:
+            statuses = self.outcomes.get(action['_id'])
+            outcome = statuses.pop(0) if statuses else 201
+            item = {'_index': action['_index'], '_id': action['_id']}
+            if isinstance(outcome, Exception):
+                item.update(status='N/A', exception=outcome, error=repr(outcome))
+            else:
+                item['status'] = outcome
+                if outcome >= 300:
+                    item['error'] = {'type': 'error', 'reason': f'status {outcome}'}
+            yield outcome in (200, 201), {'index': item}
+
+def sink_with(outcomes, **kwargs):
+    stub = StubBulk(outcomes)
+    sink = IndexingSink(mock.Mock(), backoff_seconds=0, **kwargs)
+    return sink, stub
+
+def test_only_failed_items_are_resent():
+    sink, stub = sink_with({'b': [429, 201], 'd': [ConnectionError('reset'), 201]})
+    with mock.patch.object(indexing_sink.helpers, 'streaming_bulk', stub):
+        futures = {doc_id: sink.add('resumes', doc_id, {'n': doc_id}) for doc_id in 'abcd'}
+        sink.flush()
+
+    assert stub.requests == [['a', 'b', 'c', 'd'], ['b', 'd']]
+    assert {doc_id: future.result(timeout=0) for doc_id, future in futures.items()} == {
+        'a': 'a', 'b': 'b', 'c': 'c', 'd': 'd'
+    }
+
+def test_permanent_failures_reach_the_callers_future():
+    sink, stub = sink_with({'b': [400]})
+    with mock.patch.object(indexing_sink.helpers, 'streaming_bulk', stub):
+        ok = sink.add('resumes', 'a', {})
+        rejected = sink.add('resumes', 'b', {})
+        sink.flush()
+
+    # A mapping error is not retried
+    assert stub.requests == [['a', 'b']]
+    assert ok.result(timeout=0) == 'a'
+    with pytest.raises(RuntimeError, match='status 400'):
+        rejected.result(timeout=0)
+
+def test_transient_failures_give_up_after_max_retries():
+    sink, stub = sink_with({'b': [503, 503, 503, 201]}, max_retries=2)
+    with mock.patch.object(indexing_sink.helpers, 'streaming_bulk', stub):
+        ok = sink.add('resumes', 'a', {})
+        throttled = sink.add('resumes', 'b', {})
+        sink.flush()
+
+    assert stub.requests == [['a', 'b'], ['b'], ['b']]
+    assert ok.result(timeout=0) == 'a'
+    with pytest.raises(RuntimeError, match='status 503'):
+        throttled.result(timeout=0)
+
+def test_failed_request_fails_every_unresolved_future():
+    def unreachable(client, actions, **kwargs):
+        raise ConnectionError('cluster unreachable')
+        yield
+
+    sink = IndexingSink(mock.Mock(), backoff_seconds=0)
+    with mock.patch.object(indexing_sink.helpers, 'streaming_bulk', unreachable):
+        futures = [sink.add('resumes', doc_id, {}) for doc_id in 'ab']
+        with pytest.raises(ConnectionError):
+            sink.flush()
+
+    for future in futures:
+        with pytest.raises(ConnectionError):
+            future.result(timeout=0)
+
+def test_buffer_is_flushed_at_max_docs():
+    sink, stub = sink_with({}, max_docs=2)
+    with mock.patch.object(indexing_sink.helpers, 'streaming_bulk', stub):
+        first = sink.add('resumes', 'a', {})
+        assert stub.requests == [] and not first.done()
+        sink.add('resumes', 'b', {})
+        assert stub.requests == [['a', 'b']]
+        sink.flush()  # nothing left to write
+
+    assert stub.requests == [['a', 'b']]
+    assert first.result(timeout=0) == 'a'
@@ -0,0 +1,110 @@
+"""
+Duplicate handling of the resume processor handler, against stubbed S3,
+Bedrock and OpenSearch clients
+"""
+
+import io
+import json
+from unittest import mock
+
+import pytest
+
+import indexing_sink
+import lambda_function
+from lambda_function import content_document_id
+
+METADATA = {'name': 'Asha', 'location': 'Pune, India', 'skills': ['Python'], 'total_experience_years': 4}
+
+class Stubs:
+    """S3 objects, indexed document IDs and bulk failures of one test"""
+
+    def __init__(self, monkeypatch):
+        self.objects = {}
+        self.indexed = set()
+        self.rejected = set()  # content IDs the bulk request rejects
+        self.bulk_requests = []
+
+        self.s3 = mock.Mock()
+        self.s3.get_object.side_effect = lambda Bucket, Key: {'Body': io.BytesIO(self.objects[Key])}
+        self.metadata_runtime = mock.Mock()
+        self.metadata_runtime.invoke_model.side_effect = lambda **kwargs: {'body': io.BytesIO(json.dumps(
+            {'content': [{'text': json.dumps(METADATA)}]}
+        ).encode())}
+        self.embedding_runtime = mock.Mock()
+        self.embedding_runtime.invoke_model.side_effect = lambda **kwargs: {
+            'body': io.BytesIO(json.dumps({'embedding': [0.1, 0.2, 0.3]}).encode())
+        }
+        self.opensearch = mock.MagicMock()
+        self.opensearch.exists.side_effect = lambda index, id: id in self.indexed
+
+        monkeypatch.setattr(lambda_function, 's3_client', self.s3)
+        monkeypatch.setattr(lambda_function, 'bedrock_metadata_runtime', self.metadata_runtime)
+        monkeypatch.setattr(lambda_function, 'bedrock_embedding_runtime', self.embedding_runtime)
+        monkeypatch.setattr(lambda_function, 'opensearch_data_client', self.opensearch)
+        monkeypatch.setattr(lambda_function, 'extract_text_from_pdf', lambda content: content.decode())
+        monkeypatch.setattr(indexing_sink.helpers, 'streaming_bulk', self.bulk)
+
+    def bulk(self, client, actions, **kwargs):
+        actions = list(actions)
+        self.bulk_requests.append([action['_id'] for action in actions])
+        for action in actions:
+            if action['_id'] in self.rejected:
+                yield False, {'index': {'_id': action['_id'], 'status': 400, 'error': 'mapper_parsing_exception'}}
+            else:
+                self.indexed.add(action['_id'])
+                yield True, {'index': {'_id': action['_id'], 'status': 201}}
+
+    def bedrock_calls(self):
+        return self.metadata_runtime.invoke_model.call_count + self.embedding_runtime.invoke_model.call_count
+
+    def invoke(self, **objects):
+        self.objects.update(objects)
+        event = {'Records': [{'s3': {'bucket': {'name': 'resumes'}, 'object': {'key': key}}} for key in objects]}
+        response = lambda_function.lambda_handler(event, mock.Mock(function_name='resume-processor'))
+        body = json.loads(response['body'])
+        return response['statusCode'], body, {result['object_key']: result for result in body['results']}
+
+@pytest.fixture
+def stubs(monkeypatch):
+    lambda_function.claimed_ids.clear()
+    yield Stubs(monkeypatch)
+    assert lambda_function.claimed_ids == {}
+
+def test_same_bytes_twice_in_one_event_are_indexed_once(stubs):
+    status, body, results = stubs.invoke(**{'a.pdf': b'Asha resume', 'copy-of-a.pdf': b'Asha resume'})
+
+    doc_id = content_document_id(b'Asha resume')
+    assert status == 200
+    assert sorted(result['status'] for result in results.values()) == ['duplicate', 'processed']
+    assert {result['opensearch_id'] for result in results.values()} == {doc_id}
+    assert (body['processed_files'], body['duplicate_files']) == (1, 1)
+    assert stubs.bulk_requests == [[doc_id]]
+    assert stubs.bedrock_calls() == 2  # one metadata and one embedding call
+
+def test_already_indexed_content_skips_bedrock(stubs):
+    stubs.indexed.add(content_document_id(b'Asha resume'))
+
+    status, body, results = stubs.invoke(**{'again.pdf': b'Asha resume'})
+
+    assert status == 200
+    assert results['again.pdf']['status'] == 'duplicate'
+    assert stubs.bedrock_calls() == 0
+    assert stubs.bulk_requests == []
+
+def test_duplicate_of_a_failed_claimant_fails_and_the_claim_is_released(stubs):
+    doc_id = content_document_id(b'Asha resume')
+    stubs.rejected.add(doc_id)
+
+    status, body, results = stubs.invoke(**{'a.pdf': b'Asha resume', 'copy-of-a.pdf': b'Asha resume'})
+
+    assert status == 207
+    assert [result['status'] for result in results.values()] == ['failed', 'failed']
+    errors = sorted(result['error'] for result in results.values())
+    assert 'mapper_parsing_exception' in errors[0]
+    assert errors[1] == f'The first record with this content was not indexed ({doc_id})'
+    assert all('opensearch_id' not in result for result in results.values())
+
+    # The released claim lets a later invocation process the content again
+    stubs.rejected.clear()
+    status, body, results = stubs.invoke(**{'retry.pdf': b'Asha resume'})
+    assert results['retry.pdf']['status'] == 'processed'
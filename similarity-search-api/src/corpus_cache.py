@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Warm-container corpus cache for the Similarity Search API
+Keeps compact candidate documents across Lambda invocations
+"""
+
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple
+
+class CorpusCache:
+    """
+    LRU cache of compact candidate documents keyed by (index, document id).
+
+    Entries of an index are dropped as soon as its version (a cheap fingerprint
+    such as doc count + max processed_at) changes. The cache is bounded by an
+    estimated memory footprint and evicts least recently used entries first.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()  # (index, doc_id) -> (entry, size)
+        self._versions = {}            # index -> version fingerprint
+        self._index_sizes = {}         # index -> number of cached entries
+        self._complete = {}            # index -> True when every document is cached
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def validate(self, index: str, version: Optional[Hashable]) -> bool:
+        """
+        Record the current version of an index, dropping its entries if it changed.
+
+        A version of None means the fingerprint could not be read, so nothing
+        cached for the index can be trusted.
+
+        Returns:
+            True if the cached entries of the index are still valid
+        """
+        if version is not None and self._versions.get(index) == version:
+            return True
+
+        if index in self._versions:
+            self.invalidations += 1
+        self._drop_index(index)
+
+        if version is not None:
+            self._versions[index] = version
+        return False
+
+    def get(self, index: str, doc_id: str) -> Optional[Dict]:
+        """Return a cached entry and mark it as recently used"""
+        key = (index, doc_id)
+        cached = self._entries.get(key)
+
+        if cached is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return cached[0]
+
+    def put(self, index: str, doc_id: str, entry: Dict, size: int) -> None:
+        """Insert an entry, evicting least recently used entries beyond the memory cap"""
+        if index not in self._versions or size > self.max_bytes:
+            return
+
+        key = (index, doc_id)
+        if key in self._entries:
+            self.current_bytes -= self._entries.pop(key)[1]
+            self._index_sizes[index] -= 1
+
+        self._entries[key] = (entry, size)
+        self.current_bytes += size
+        self._index_sizes[index] = self._index_sizes.get(index, 0) + 1
+
+        while self.current_bytes > self.max_bytes:
+            (evicted_index, _), (_, evicted_size) = self._entries.popitem(last=False)
+            self.current_bytes -= evicted_size
+            self._index_sizes[evicted_index] -= 1
+            self._complete.pop(evicted_index, None)
+            self.evictions += 1
+
+    def mark_complete(self, index: str, document_count: int) -> None:
+        """Flag an index as fully cached after a complete walk of `document_count` documents"""
+        if self._index_sizes.get(index, 0) == document_count:
+            self._complete[index] = True
+
+    def is_complete(self, index: str) -> bool:
+        """Whether every document of the index is cached"""
+        return self._complete.get(index, False)
+
+    def iter_pages(self, index: str, page_size: int) -> Iterator[List[Tuple[str, Dict]]]:
+        """Yield the cached (doc_id, entry) pairs of a fully cached index page by page"""
+        items = [(doc_id, cached[0]) for (entry_index, doc_id), cached in self._entries.items()
+                 if entry_index == index]
+        items.sort(key=lambda item: item[0])
+
+        for start in range(0, len(items), page_size):
+            self.hits += len(items[start:start + page_size])
+            yield items[start:start + page_size]
+
+    def stats(self) -> Dict:
+        """Counters exposed on /health"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'complete_indices': sorted(self._complete)
+        }
+
+    def _drop_index(self, index: str) -> None:
+        for key in [key for key in self._entries if key[0] == index]:
+            self.current_bytes -= self._entries.pop(key)[1]
+        self._index_sizes.pop(index, None)
+        self._complete.pop(index, None)
+        self._versions.pop(index, None)
@@ -10,25 +10,116 @@ import os
 # Add lib directory to Python path for dependencies
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lib'))
 
+import heapq
 import json
 import os
+import re
 import sys
+import time
+import uuid
 import boto3
-from typing import Dict, List, Optional
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 
 # Add the current directory to Python path for imports
 sys.path.append(os.path.dirname(__file__))
 
 # Import our similarity matching components
-from advanced_matcher import AdvancedMatcher
-from opensearchpy import OpenSearch, RequestsHttpConnection
+from advanced_matcher import AdvancedMatcher, RESUME_DISPLAY_FIELDS, JOB_DISPLAY_FIELDS
+from corpus_cache import CorpusCache
+from document_features import DEGREE_LEVELS, normalize_skill
+from gazetteer import location_features
+from server_scoring import SCRIPT_FIELD_TYPES, SCRIPT_FIELDS, SCRIPT_ID, SCRIPT_SOURCE, mirror_score, script_params
+from opensearchpy import NotFoundError, OpenSearch, RequestsHttpConnection
 from requests_aws4auth import AWS4Auth
 
+# Candidate retrieval settings
+DEFAULT_SHORTLIST_SIZE = int(os.environ.get('KNN_SHORTLIST_SIZE', '100'))
+MAX_SHORTLIST_SIZE = 1000
+BRUTE_FORCE_SIZE = 100  # Page size of the legacy match_all scan
+
+# Resumes indexed before must-have skills were canonicalized at ingest
+NO_CANONICAL_SKILLS = {"bool": {"must_not": [{"exists": {"field": "canonical_skills.ids"}}]}}
+
+# Candidates whose location could not be placed on the map at ingest
+NO_GEO_LOCATION = {"bool": {"must_not": [{"exists": {"field": "geo_location"}}]}}
+
+# Exhaustive (point-in-time) scan settings
+EXHAUSTIVE_PAGE_SIZE = int(os.environ.get('EXHAUSTIVE_PAGE_SIZE', '500'))
+PIT_KEEP_ALIVE = '2m'
+TIME_BUDGET_SAFETY_MS = 3000  # Leave room to serialize the response before the Lambda timeout
+
+# Batch matching limits
+MAX_BATCH_QUERIES = 50
+MAX_BATCH_CANDIDATES = 1000
+
+# Asynchronous match runs (POST /match/jobs): state and partial results live in this index
+MATCH_RUNS_INDEX = os.environ.get('MATCH_RUNS_INDEX_NAME', 'match_runs')
+MAX_RUN_LIMIT = 1000
+# A run still unfinished after this many worker invocations fails; stays below the
+# 16 chained invocations after which Lambda's recursive loop detection stops the chain
+MAX_RUN_INVOCATIONS = 15
+RUN_CHECKPOINT_SECONDS = 15  # How often a worker saves partial results while scanning
+RUN_PIT_KEEP_ALIVE = '15m'  # Snapshot of a whole-index run, kept alive between worker invocations
+MATCH_WORKER_ACTION = 'run_match_job'  # Marks the worker's self-invocation payload
+DEFAULT_RUN_PAGE_SIZE = 20
+MAX_RUN_PAGE_SIZE = 100
+MATCH_RUNS_PROPERTIES = {
+    'run_id': {'type': 'keyword'},
+    'status': {'type': 'keyword'},
+    'created_at': {'type': 'date'},
+    'updated_at': {'type': 'date'},
+    'request': {'type': 'object', 'enabled': False},
+    'progress': {'type': 'object', 'enabled': False},
+    'cursor': {'type': 'object', 'enabled': False},
+    'results': {'type': 'object', 'enabled': False},
+    'not_found': {'type': 'keyword'},
+    'scoring_stats': {'type': 'object', 'enabled': False},
+    'error': {'type': 'text'}
+}
+
+# Warm-container corpus cache
+CORPUS_CACHE_MAX_MB = int(os.environ.get('CORPUS_CACHE_MAX_MB', '256'))
+
+# Metadata keys accepted in the `filters` request parameter
+FILTER_KEY_PATTERN = re.compile(r'^[a-z_]+$')
+
+# Fields derived at ingest, filtered by value(s) or by a {"gte"/"gt"/"lte"/"lt"} range
+DERIVED_FILTER_FIELDS = {'exp_min', 'exp_max', 'experience_years', 'degree_level', 'industry_tags'}
+RANGE_OPERATORS = {'gte', 'gt', 'lte', 'lt'}
+
+class RankTieBreak:
+    """
+    Ranking key part that puts equal scores in ascending document ID order
+    
+    Candidates arrive in a different order from the corpus cache than from a
+    point-in-time walk, so ties are broken on the ID, not on arrival order.
+    Used as the second element of (score, RankTieBreak(doc_id), ...) heap entries.
+    """
+    __slots__ = ('doc_id',)
+    
+    def __init__(self, doc_id: str):
+        self.doc_id = doc_id
+    
+    def __lt__(self, other: 'RankTieBreak') -> bool:
+        return self.doc_id > other.doc_id
+    
+    def __gt__(self, other: 'RankTieBreak') -> bool:
+        return self.doc_id < other.doc_id
+    
+    def __eq__(self, other) -> bool:
+        return isinstance(other, RankTieBreak) and self.doc_id == other.doc_id
+
 class LambdaSimilarityAPI:
     def __init__(self):
         """Initialize the Lambda similarity API"""
         self.matcher = AdvancedMatcher()
         self.opensearch_client = self._initialize_opensearch()
+        self.corpus_cache = CorpusCache(max_bytes=CORPUS_CACHE_MAX_MB * 1024 * 1024)
+        self.stored_scripts = set()  # stored script IDs known to exist on the cluster
+        self.confirmed_fields = set()  # (index, field) pairs known to be mapped with the expected type
+        self.runs_index_ready = False
+        self.lambda_client = None  # created on the first match run
     
     def _initialize_opensearch(self):
         """Initialize OpenSearch client for Lambda"""
@@ -77,6 +168,8 @@ class LambdaSimilarityAPI:
                 'status': 'healthy',
                 'service': 'similarity-search-api',
                 'opensearch_connected': self.opensearch_client is not None,
+                'corpus_cache': self.corpus_cache.stats(),
+                'fuzzy_cache': self.matcher.fuzzy_cache.stats(),
                 'version': '1.0.0'
             }),
             'headers': {
@@ -85,12 +178,17 @@ class LambdaSimilarityAPI:
             }
         }
     
-    def search_resumes_for_job(self, event_body: Dict) -> Dict:
+    def search_resumes_for_job(self, event_body: Dict, context=None) -> Dict:
         """Find best matching resumes for a job description"""
         try:
             job_id = event_body.get('job_id')
             limit = event_body.get('limit', 10)
             min_score = event_body.get('min_score', 50.0)
+            shortlist_size = event_body.get('shortlist_size', DEFAULT_SHORTLIST_SIZE)
+            compare_brute_force = event_body.get('compare_brute_force', False)
+            exhaustive = event_body.get('exhaustive', False)
+            scoring = event_body.get('scoring', 'python')
+            parity_check = event_body.get('parity_check', False)
             
             if not job_id:
                 return {
@@ -99,7 +197,55 @@ class LambdaSimilarityAPI:
                     'headers': {'Content-Type': 'application/json'}
                 }
             
-            results = self._find_matching_resumes(job_id, limit, min_score)
+            if scoring not in ('python', 'server'):
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': "scoring must be 'python' or 'server'"}),
+                    'headers': {'Content-Type': 'application/json'}
+                }
+            
+            try:
+                filter_clauses = self._build_filter_clauses(event_body.get('filters'))
+                skill_clause = self._build_skill_clause(
+                    event_body.get('must_have_skills'), event_body.get('min_skill_overlap')
+                )
+                location_filter = self._parse_location_filter(event_body)
+            except ValueError as e:
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': str(e)}),
+                    'headers': {'Content-Type': 'application/json'}
+                }
+            
+            if scoring == 'server':
+                # The stored script needs typed doc values, e.g. cosineSimilarity a knn_vector
+                resume_index = os.environ.get('RESUME_INDEX_NAME', 'resumes')
+                mistyped = self._mistyped_fields(resume_index, SCRIPT_FIELD_TYPES)
+                if mistyped:
+                    return {
+                        'statusCode': 409,
+                        'body': json.dumps({
+                            'error': f"server scoring is unavailable: {resume_index} maps these fields with "
+                                     f"the wrong type; reindex it or use scoring 'python'",
+                            'mistyped_fields': mistyped
+                        }),
+                        'headers': {'Content-Type': 'application/json'}
+                    }
+            
+            shortlist_size = max(int(limit), min(int(shortlist_size), MAX_SHORTLIST_SIZE))
+            
+            results = self._find_matching_resumes(
+                job_id, limit, min_score,
+                shortlist_size=shortlist_size,
+                compare_brute_force=compare_brute_force,
+                filter_clauses=filter_clauses,
+                skill_clause=skill_clause,
+                location_filter=location_filter,
+                scoring=scoring,
+                parity_check=parity_check,
+                exhaustive=exhaustive,
+                context=context
+            )
             
             return {
                 'statusCode': 200,
@@ -117,12 +263,15 @@ class LambdaSimilarityAPI:
                 'headers': {'Content-Type': 'application/json'}
             }
     
-    def search_jobs_for_resume(self, event_body: Dict) -> Dict:
+    def search_jobs_for_resume(self, event_body: Dict, context=None) -> Dict:
         """Find best matching jobs for a resume"""
         try:
             resume_id = event_body.get('resume_id')
             limit = event_body.get('limit', 10)
             min_score = event_body.get('min_score', 50.0)
+            shortlist_size = event_body.get('shortlist_size', DEFAULT_SHORTLIST_SIZE)
+            compare_brute_force = event_body.get('compare_brute_force', False)
+            exhaustive = event_body.get('exhaustive', False)
             
             if not resume_id:
                 return {
@@ -131,7 +280,27 @@ class LambdaSimilarityAPI:
                     'headers': {'Content-Type': 'application/json'}
                 }
             
-            results = self._find_matching_jobs(resume_id, limit, min_score)
+            try:
+                filter_clauses = self._build_filter_clauses(event_body.get('filters'))
+                location_filter = self._parse_location_filter(event_body)
+            except ValueError as e:
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': str(e)}),
+                    'headers': {'Content-Type': 'application/json'}
+                }
+            
+            shortlist_size = max(int(limit), min(int(shortlist_size), MAX_SHORTLIST_SIZE))
+            
+            results = self._find_matching_jobs(
+                resume_id, limit, min_score,
+                shortlist_size=shortlist_size,
+                compare_brute_force=compare_brute_force,
+                filter_clauses=filter_clauses,
+                location_filter=location_filter,
+                exhaustive=exhaustive,
+                context=context
+            )
             
             return {
                 'statusCode': 200,
@@ -180,141 +349,1678 @@ class LambdaSimilarityAPI:
                 'headers': {'Content-Type': 'application/json'}
             }
     
-    def _find_matching_resumes(self, job_id: str, limit: int = 10, min_score: float = 50.0) -> Dict:
+    def batch_match(self, event_body: Dict, context=None) -> Dict:
+        """Find the best matches for many jobs (or resumes) in one call"""
+        try:
+            job_ids = event_body.get('job_ids') or []
+            resume_ids = event_body.get('resume_ids') or []
+            limit = event_body.get('limit', 10)
+            min_score = event_body.get('min_score', 50.0)
+            
+            error = self._batch_request_error(job_ids, resume_ids)
+            if error:
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': error}),
+                    'headers': {'Content-Type': 'application/json'}
+                }
+            
+            results = self._batch_match(job_ids, resume_ids, int(limit), min_score, context)
+            
+            return {
+                'statusCode': 200,
+                'body': json.dumps(results),
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                }
+            }
+            
+        except Exception as e:
+            return {
+                'statusCode': 500,
+                'body': json.dumps({'error': str(e)}),
+                'headers': {'Content-Type': 'application/json'}
+            }
+    
+    def start_match_run(self, event_body: Dict, context=None) -> Dict:
+        """
+        Start an asynchronous match run (POST /match/jobs)
+        
+        Takes the batch_match request body, stores the run in the match runs index
+        and hands it to a worker invocation of this function; poll the returned
+        status_url for progress and results.
+        """
+        try:
+            job_ids = event_body.get('job_ids') or []
+            resume_ids = event_body.get('resume_ids') or []
+            limit = event_body.get('limit', 10)
+            min_score = event_body.get('min_score', 50.0)
+            
+            error = self._batch_request_error(job_ids, resume_ids)
+            if not error and not 1 <= int(limit) <= MAX_RUN_LIMIT:
+                error = f'limit must be between 1 and {MAX_RUN_LIMIT}'
+            if error:
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': error}),
+                    'headers': {'Content-Type': 'application/json'}
+                }
+            
+            if not self.opensearch_client:
+                return {
+                    'statusCode': 500,
+                    'body': json.dumps({'error': 'OpenSearch client not available'}),
+                    'headers': {'Content-Type': 'application/json'}
+                }
+            
+            now = datetime.utcnow().isoformat()
+            run = {
+                'run_id': str(uuid.uuid4()),
+                'status': 'queued',
+                'created_at': now,
+                'updated_at': now,
+                'request': {
+                    'job_ids': job_ids,
+                    # Candidate ids are scanned in sorted order so the cursor can resume them
+                    'resume_ids': sorted(set(resume_ids)) if job_ids else resume_ids,
+                    'limit': int(limit),
+                    'min_score': min_score
+                },
+                'progress': {'documents_scanned': 0, 'documents_total': None, 'invocations': 0},
+                'cursor': None,
+                'results': [],
+                'not_found': [],
+                'scoring_stats': {'candidates_scored': 0, 'candidates_pruned': 0},
+                'error': None
+            }
+            self._save_run(run)
+            
+            try:
+                self._invoke_worker(run['run_id'], context)
+            except Exception as e:
+                run['status'] = 'failed'
+                run['error'] = f'Could not start the match worker: {str(e)}'
+                self._save_run(run)
+                raise
+            
+            return {
+                'statusCode': 202,
+                'body': json.dumps({
+                    'run_id': run['run_id'],
+                    'status': run['status'],
+                    'status_url': f"/match/jobs/{run['run_id']}"
+                }),
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                }
+            }
+            
+        except Exception as e:
+            return {
+                'statusCode': 500,
+                'body': json.dumps({'error': str(e)}),
+                'headers': {'Content-Type': 'application/json'}
+            }
+    
+    def get_match_run(self, run_id: str, query_params: Optional[Dict] = None) -> Dict:
+        """
+        Progress and results of a match run (GET /match/jobs/{run_id})
+        
+        Results are the current top-K of every query document - partial while the
+        run is queued or running - paged with `page`/`page_size` and optionally
+        narrowed to one `query_id`.
+        """
+        try:
+            query_params = query_params or {}
+            try:
+                page = int(query_params.get('page', 1))
+                page_size = int(query_params.get('page_size', DEFAULT_RUN_PAGE_SIZE))
+            except (TypeError, ValueError):
+                page, page_size = 0, 0
+            if page < 1 or not 1 <= page_size <= MAX_RUN_PAGE_SIZE:
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({
+                        'error': f'page must be >= 1 and page_size between 1 and {MAX_RUN_PAGE_SIZE}'
+                    }),
+                    'headers': {'Content-Type': 'application/json'}
+                }
+            
+            run = self._get_run(run_id) if self.opensearch_client else None
+            if run is None:
+                return {
+                    'statusCode': 404,
+                    'body': json.dumps({'error': f'Match run {run_id} not found'}),
+                    'headers': {'Content-Type': 'application/json'}
+                }
+            
+            request = run['request']
+            roles = self._batch_roles(request['job_ids'], request['resume_ids'])
+            query_id = query_params.get('query_id')
+            offset = (page - 1) * page_size
+            
+            results = []
+            for result in run['results']:
+                if query_id is not None and result[roles['query_field']] != query_id:
+                    continue
+                results.append(dict(result, **{
+                    'total_matches': len(result['matches']),
+                    'matches': [dict(match) for match in result['matches'][offset:offset + page_size]]
+                }))
+            
+            # Display fields for the returned page only, in one mget
+            self._hydrate_matches(
+                roles['candidate_index'], roles['candidate_type'],
+                [match for result in results for match in result['matches']], fetched_fields=[]
+            )
+            
+            progress = dict(run['progress'])
+            total = progress.get('documents_total')
+            if run['status'] == 'completed':
+                progress['percent'] = 100.0
+            else:
+                progress['percent'] = round(min(100.0, 100.0 * progress['documents_scanned'] / total), 1) if total else 0.0
+            
+            body = {
+                'run_id': run['run_id'],
+                'status': run['status'],
+                'complete': run['status'] == 'completed',
+                'created_at': run['created_at'],
+                'updated_at': run['updated_at'],
+                'query_type': roles['query_field'],
+                'progress': progress,
+                'page': page,
+                'page_size': page_size,
+                'results': results,
+                'not_found': run['not_found'],
+                'scoring_stats': self._scoring_summary(run['scoring_stats'])
+            }
+            if run.get('error'):
+                body['error'] = run['error']
+            
+            return {
+                'statusCode': 200,
+                'body': json.dumps(body),
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                }
+            }
+            
+        except Exception as e:
+            return {
+                'statusCode': 500,
+                'body': json.dumps({'error': str(e)}),
+                'headers': {'Content-Type': 'application/json'}
+            }
+    
+    def run_match_job(self, run_id: str, context=None) -> Dict:
+        """
+        Worker of a match run, invoked asynchronously by this function
+        
+        Scans the candidates from the run's cursor on, saving the partial top-K of
+        every query at most every RUN_CHECKPOINT_SECONDS. When the invocation runs
+        low on time the run is saved and handed to a fresh invocation, which picks
+        up after the last scanned page of the run's snapshot.
+        """
+        if not self.opensearch_client:
+            print(f"Match run {run_id}: OpenSearch client not available")
+            return {'run_id': run_id, 'status': 'unavailable'}
+        
+        run = self._get_run(run_id)
+        if run is None or run['status'] in ('completed', 'failed'):
+            print(f"Match run {run_id}: nothing to do ({run['status'] if run else 'not found'})")
+            return {'run_id': run_id, 'status': run['status'] if run else 'not_found'}
+        
+        try:
+            request, progress = run['request'], run['progress']
+            progress['invocations'] += 1
+            if progress['invocations'] > MAX_RUN_INVOCATIONS:
+                raise RuntimeError(f'Run did not finish within {MAX_RUN_INVOCATIONS} worker invocations')
+            run['status'] = 'running'
+            
+            roles = self._batch_roles(request['job_ids'], request['resume_ids'])
+            candidate_index, candidate_type = roles['candidate_index'], roles['candidate_type']
+            limit, min_score = request['limit'], request['min_score']
+            
+            queries, run['not_found'] = self._load_queries(
+                roles['query_index'], roles['query_type'], roles['query_ids'], roles['display_fields']
+            )
+            self._restore_heaps(queries, run['results'], roles['query_field'], roles['id_field'])
+            if progress['documents_total'] is None:
+                progress['documents_total'] = len(roles['candidate_ids']) or self._count(candidate_index)
+            self._save_run(run, queries, roles)
+            
+            self._sync_corpus_cache(candidate_index)
+            
+            exhausted = True
+            slowest_page_ms = 0.0
+            last_checkpoint = time.perf_counter()
+            
+            if run['cursor'] is None:
+                run['cursor'] = self._run_cursor(candidate_index, roles['candidate_ids'])
+            
+            pages_iter = self._candidate_pages(candidate_index, candidate_type, roles['candidate_ids'],
+                                               cursor=run['cursor'])
+            try:
+                page_start = time.perf_counter()
+                for hits in pages_iter:
+                    if not queries:
+                        break
+                    self._score_page(hits, queries, roles['id_field'], limit, min_score, run['scoring_stats'])
+                    progress['documents_scanned'] += len(hits)
+                    slowest_page_ms = max(slowest_page_ms, (time.perf_counter() - page_start) * 1000)
+                    
+                    if not self._has_time_for_page(context, slowest_page_ms):
+                        exhausted = False
+                        break
+                    if time.perf_counter() - last_checkpoint >= RUN_CHECKPOINT_SECONDS:
+                        self._save_run(run, queries, roles)
+                        last_checkpoint = time.perf_counter()
+                    page_start = time.perf_counter()
+            finally:
+                pages_iter.close()
+            
+            if exhausted:
+                run['status'] = 'completed'
+                self._release_run_snapshot(run)
+                self._save_run(run, queries, roles)
+            else:
+                self._save_run(run, queries, roles)
+                self._invoke_worker(run_id, context)
+            
+            print(f"Match run {run_id}: {run['status']} after {progress['documents_scanned']} documents "
+                  f"({progress['invocations']} invocations)")
+            
+        except Exception as e:
+            print(f"Match run {run_id} failed: {str(e)}")
+            run['status'] = 'failed'
+            run['error'] = str(e)
+            self._release_run_snapshot(run)
+            self._save_run(run)
+        
+        return {'run_id': run_id, 'status': run['status']}
+    
+    def _batch_request_error(self, job_ids, resume_ids) -> Optional[str]:
+        """Validation error of a batch (or match run) request, or None when valid"""
+        if not isinstance(job_ids, list) or not isinstance(resume_ids, list):
+            return 'job_ids and resume_ids must be lists of ids'
+        if not job_ids and not resume_ids:
+            return 'job_ids or resume_ids is required'
+        if len(job_ids or resume_ids) > MAX_BATCH_QUERIES:
+            return f'At most {MAX_BATCH_QUERIES} query documents are allowed per batch'
+        if job_ids and len(resume_ids) > MAX_BATCH_CANDIDATES:
+            return f'At most {MAX_BATCH_CANDIDATES} resume_ids are allowed per batch'
+        return None
+    
+    def _find_matching_resumes(self, job_id: str, limit: int = 10, min_score: float = 50.0,
+                               shortlist_size: int = DEFAULT_SHORTLIST_SIZE,
+                               compare_brute_force: bool = False,
+                               filter_clauses: Optional[List[Dict]] = None,
+                               exhaustive: bool = False, context=None,
+                               skill_clause: Optional[Dict] = None,
+                               location_filter: Optional[Dict] = None,
+                               scoring: str = 'python', parity_check: bool = False) -> Dict:
         """Find the best matching resumes for a given job"""
         
         if not self.opensearch_client:
             return {'error': 'OpenSearch client not available'}
         
         try:
-            # Get job document
+            resume_index = os.environ.get('RESUME_INDEX_NAME', 'resumes')
+            
+            # Get job document (only the fields scoring and the response need)
             job_response = self.opensearch_client.get(
                 index=os.environ.get('JOB_INDEX_NAME', 'job_descriptions'),
-                id=job_id
+                id=job_id,
+                _source_includes=self._projection('job_description') + JOB_DISPLAY_FIELDS
             )
             job_data = job_response['_source']
             
-            # Search all resumes
-            resume_query = {
-                "query": {"match_all": {}},
-                "size": 100  # Get up to 100 resumes to analyze
-            }
+            self._sync_corpus_cache(resume_index)
             
-            resume_response = self.opensearch_client.search(
-                index=os.environ.get('RESUME_INDEX_NAME', 'resumes'),
-                body=resume_query
-            )
+            location_summary = None
+            if location_filter:
+                location_clause, location_summary = self._build_location_clause(
+                    job_data.get('metadata', {}).get('job_location'), **location_filter
+                )
+                if location_clause and not self._location_filter_available(resume_index, location_summary):
+                    location_clause = None
+                if location_clause:
+                    self._location_filter_stats(resume_index, filter_clauses, location_clause, location_summary)
+                    filter_clauses = (filter_clauses or []) + [location_clause]
+            
+            # Must-have skills are enforced by the cluster, before any candidate is fetched.
+            # Resumes indexed before `canonical_skills` existed pass the cluster filter and
+            # are checked by the matcher instead (server scoring has no Python pass, so
+            # they stay excluded there)
+            skill_filter = None
+            skill_check = None
+            if skill_clause:
+                keep_uncanonicalized = scoring != 'server'
+                skill_filter = self._skill_filter_stats(resume_index, filter_clauses, skill_clause,
+                                                        keep_uncanonicalized)
+                if keep_uncanonicalized:
+                    skill_check = self._skill_check(skill_clause, skill_filter)
+                    skill_clause = {"bool": {"should": [skill_clause, NO_CANONICAL_SKILLS], "minimum_should_match": 1}}
+                filter_clauses = (filter_clauses or []) + [skill_clause]
+            
+            scoring_stats = {'candidates_scored': 0, 'candidates_pruned': 0}
+            
+            # Query-side facts are derived once and reused for every candidate
+            profile_pair = self._pair_function('job_description', self.matcher.prepare_job(job_data))
+            source_pair = self._pair_function('job_description', job_data)
+            
+            query_embedding = self.matcher.normalize_embedding(job_data.get('embeddings'))
+            
+            def score_hits(hits, score_floor=None, stats=None):
+                if skill_check:
+                    hits = [hit for hit in hits if skill_check(hit)]
+                semantic_scores = self._semantic_scores(query_embedding, hits)
+                return self._rank_hits(hits, profile_pair, 'resume_id', limit, min_score, score_floor, stats,
+                                       semantic_scores)
             
-            # Calculate similarity scores for each resume
-            matches = []
-            for hit in resume_response['hits']['hits']:
-                resume_data = hit['_source']
-                resume_id = hit['_id']
+            parity = None
+            if scoring == 'server':
+                # Ranked inside OpenSearch by the stored script; only the top matches come back
+                params = script_params(self.matcher, job_data)
+                matches, retrieval, candidates_analyzed = self._server_top_k(
+                    resume_index, params, limit, min_score, filter_clauses
+                )
+                scoring_stats['candidates_scored'] = candidates_analyzed
+                if parity_check:
+                    parity = self._server_parity_check(resume_index, job_data, params, matches)
+            elif exhaustive:
+                # Exact ranking over the whole index, streamed page by page
+                matches, retrieval = self._exhaustive_top_k(
+                    resume_index, 'resume', score_hits, limit, filter_clauses, context, scoring_stats
+                )
+                candidates_analyzed = retrieval['documents_scanned']
+            else:
+                # Stage 1: semantic shortlist from the k-NN index
+                retrieval_start = time.perf_counter()
+                resume_hits, retrieval_mode, knn_error = self._retrieve_candidates(
+                    resume_index, 'resume', job_data.get('embeddings'), shortlist_size, filter_clauses
+                )
+                retrieval_ms = (time.perf_counter() - retrieval_start) * 1000
                 
-                try:
-                    # Calculate detailed similarity with error handling
-                    similarity_result = self.matcher.calculate_similarity_score(resume_data, job_data)
-                    
-                    if similarity_result['overall_score'] >= min_score:
-                        matches.append({
-                            'resume_id': resume_id,
-                            'score': similarity_result['overall_score'],
-                            'component_scores': similarity_result['component_scores'],
-                            'match_details': similarity_result['match_details'],
-                            'recommendations': similarity_result['recommendations'],
-                            'candidate_name': resume_data.get('metadata', {}).get('name', 'Unknown'),
-                            'candidate_location': resume_data.get('metadata', {}).get('location', 'Unknown'),
-                            'candidate_skills': resume_data.get('metadata', {}).get('skills', []),
-                            'candidate_experience': resume_data.get('metadata', {}).get('total_experience_years', 0)
-                        })
-                except Exception as e:
-                    print(f"Error calculating similarity for resume {resume_id}: {str(e)}")
-                    # Skip this resume if similarity calculation fails
-                    continue
+                # Stage 2: rerank the shortlist with the multi-factor matcher
+                scoring_start = time.perf_counter()
+                matches = score_hits(resume_hits, stats=scoring_stats)
+                scoring_ms = (time.perf_counter() - scoring_start) * 1000
+                
+                candidates_analyzed = len(resume_hits)
+                retrieval = {
+                    'mode': retrieval_mode,
+                    'shortlist_size': shortlist_size,
+                    'filters_applied': len(filter_clauses or []),
+                    'retrieval_ms': round(retrieval_ms, 2),
+                    'scoring_ms': round(scoring_ms, 2)
+                }
+                if knn_error:
+                    retrieval['knn_error'] = knn_error
+                    retrieval['candidate_limit'] = BRUTE_FORCE_SIZE
             
-            # Sort by score and limit results
-            matches.sort(key=lambda x: x['score'], reverse=True)
-            matches = matches[:limit]
+            # Explanations and display-only fields are built for the returned matches alone
+            if scoring == 'server':
+                # The script returns overall scores only, with the display fields already fetched
+                matches = self._hydrate_matches(resume_index, 'resume', matches, fetched_fields=RESUME_DISPLAY_FIELDS)
+            else:
+                matches = self._explain_matches(matches, source_pair)
+                matches = self._hydrate_matches(resume_index, 'resume', matches)
             
-            return {
+            result = {
                 'job_id': job_id,
                 'job_title': job_data.get('metadata', {}).get('job_title', 'Unknown'),
-                'total_candidates_analyzed': len(resume_response['hits']['hits']),
+                'total_candidates_analyzed': candidates_analyzed,
                 'qualified_candidates': len(matches),
-                'matches': matches
+                'matches': matches,
+                'retrieval': retrieval,
+                'scoring_stats': self._scoring_summary(scoring_stats)
             }
             
+            if skill_filter:
+                result['skill_filter'] = skill_filter
+            
+            if location_summary:
+                result['location_filter'] = location_summary
+            
+            if parity:
+                result['parity_check'] = parity
+            
+            if compare_brute_force and not exhaustive and scoring == 'python':
+                result['brute_force_comparison'] = self._compare_with_brute_force(
+                    resume_index, 'resume', matches, 'resume_id', score_hits,
+                    retrieval_ms + scoring_ms, filter_clauses
+                )
+            
+            return result
+            
         except Exception as e:
             return {'error': f'Error finding matching resumes: {str(e)}'}
     
-    def _find_matching_jobs(self, resume_id: str, limit: int = 10, min_score: float = 50.0) -> Dict:
+    def _build_filter_clauses(self, filters: Optional[Dict]) -> List[Dict]:
+        """
+        Compile the `filters` request parameter into OpenSearch filter clauses.
+        
+        Each key is a metadata field and each value a string or list of strings,
+        e.g. {"employment_type": "Full-time", "job_location": ["Remote", "Pune, India"]}.
+        Fields derived at ingest (DERIVED_FILTER_FIELDS) are filtered directly and also
+        accept a range, e.g. {"degree_level": {"gte": "bachelor"}, "exp_min": {"lte": 3}}.
+        """
+        if not filters:
+            return []
+        
+        if not isinstance(filters, dict):
+            raise ValueError('filters must be an object of metadata field -> value(s)')
+        
+        clauses = []
+        for field, values in filters.items():
+            if not FILTER_KEY_PATTERN.match(field):
+                raise ValueError(f'Invalid filter field: {field}')
+            
+            if field in DERIVED_FILTER_FIELDS:
+                clauses.append(self._derived_filter_clause(field, values))
+                continue
+            
+            if not isinstance(values, list):
+                values = [values]
+            
+            clauses.append({"terms": {f"metadata.{field}.keyword": [str(value) for value in values]}})
+        
+        return clauses
+    
+    def _derived_filter_clause(self, field: str, values) -> Dict:
+        """Filter clause on a field derived at ingest: a range object, or value(s) to match"""
+        if isinstance(values, dict):
+            if not values or set(values) - RANGE_OPERATORS:
+                raise ValueError(f'{field} range accepts only gte, gt, lte and lt')
+            return {"range": {field: {op: self._filter_number(field, bound) for op, bound in values.items()}}}
+        
+        if not isinstance(values, list):
+            values = [values]
+        
+        if field == 'industry_tags':
+            return {"terms": {field: [str(value) for value in values]}}
+        return {"terms": {field: [self._filter_number(field, value) for value in values]}}
+    
+    def _filter_number(self, field: str, value) -> float:
+        """Numeric filter value; degree levels may also be given by name (e.g. "master")"""
+        if field == 'degree_level' and isinstance(value, str) and value.lower() in DEGREE_LEVELS:
+            return DEGREE_LEVELS[value.lower()]
+        
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid {field} filter value: {value}')
+    
+    def _build_skill_clause(self, must_have_skills: Optional[List[str]],
+                            min_skill_overlap: Optional[int] = None) -> Optional[Dict]:
+        """
+        Compile `must_have_skills` / `min_skill_overlap` into an OpenSearch filter clause.
+        
+        Skills are matched against the `canonical_skills.ids` keyword field written at
+        ingest, so a skill is satisfied by the skill itself or by any skill of the same
+        synonym category (e.g. "python" by "django"). `min_skill_overlap` defaults to
+        all of the listed skills.
+        """
+        if not must_have_skills:
+            return None
+        
+        if not isinstance(must_have_skills, list):
+            raise ValueError('must_have_skills must be a list of skills')
+        
+        skills = list(dict.fromkeys(normalize_skill(skill) for skill in must_have_skills))
+        skills = [skill for skill in skills if skill]
+        if not skills:
+            return None
+        
+        if min_skill_overlap is None:
+            min_skill_overlap = len(skills)
+        try:
+            min_skill_overlap = int(min_skill_overlap)
+        except (TypeError, ValueError):
+            raise ValueError('min_skill_overlap must be an integer')
+        if not 1 <= min_skill_overlap <= len(skills):
+            raise ValueError(f'min_skill_overlap must be between 1 and {len(skills)}')
+        
+        should = [
+            {"terms": {"canonical_skills.ids": [skill] + list(self.matcher.skill_categories(skill))}}
+            for skill in skills
+        ]
+        return {"bool": {"should": should, "minimum_should_match": min_skill_overlap}}
+    
+    def _parse_location_filter(self, event_body: Dict) -> Optional[Dict]:
+        """Validate the `max_distance_km` / `remote_ok` / `strict_location` request parameters"""
+        max_distance_km = event_body.get('max_distance_km')
+        if max_distance_km is None:
+            return None
+        
+        try:
+            max_distance_km = float(max_distance_km)
+        except (TypeError, ValueError):
+            raise ValueError('max_distance_km must be a number')
+        if max_distance_km <= 0:
+            raise ValueError('max_distance_km must be positive')
+        
+        remote_ok = event_body.get('remote_ok', True)
+        if not isinstance(remote_ok, bool):
+            raise ValueError('remote_ok must be true or false')
+        
+        strict = event_body.get('strict_location', False)
+        if not isinstance(strict, bool):
+            raise ValueError('strict_location must be true or false')
+        
+        return {'max_distance_km': max_distance_km, 'remote_ok': remote_ok, 'strict': strict}
+    
+    def _build_location_clause(self, query_location: Optional[str], max_distance_km: float,
+                               remote_ok: bool = True, strict: bool = False) -> Tuple[Optional[Dict], Dict]:
+        """
+        Compile a distance limit around the query document's location into a filter clause.
+        
+        Candidates are matched on the `geo_location` / `is_remote` fields written at
+        ingest; with `remote_ok` remote candidates pass regardless of distance.
+        Candidates without a `geo_location` (a city outside the gazetteer, or indexed
+        before the field existed) cannot be measured and pass too, unless `strict`.
+        No clause is built when the query location is remote (every candidate is
+        feasible) or not in the gazetteer (there is no point to measure from).
+        
+        Returns:
+            (clause or None, summary for the response)
+        """
+        summary = {
+            'max_distance_km': max_distance_km,
+            'remote_ok': remote_ok,
+            'strict': strict,
+            'applied': False
+        }
+        features = location_features(query_location)
+        
+        if features['is_remote']:
+            summary['reason'] = 'query location is remote'
+            return None, summary
+        
+        if not features['geo_location']:
+            summary['reason'] = 'query location not found in gazetteer'
+            return None, summary
+        
+        clause = {
+            "geo_distance": {
+                "distance": f"{max_distance_km}km",
+                "geo_location": features['geo_location']
+            }
+        }
+        should = [clause]
+        if remote_ok:
+            should.append({"term": {"is_remote": True}})
+        if not strict:
+            should.append(NO_GEO_LOCATION)
+        if len(should) > 1:
+            clause = {"bool": {"should": should, "minimum_should_match": 1}}
+        
+        summary['applied'] = True
+        return clause, summary
+    
+    def _mistyped_fields(self, index_name: str, expected_types: Dict[str, Tuple[str, ...]]) -> Dict[str, str]:
+        """
+        Find the fields of an index not mapped with one of their expected types.
+        
+        A field first written without an explicit mapping keeps its dynamic type
+        (an object for `{lat, lon}`, text for IDs, a float array for vectors) until
+        the index is reindexed. Only confirmed fields are cached, so a reindex is
+        picked up on the next request.
+        
+        Returns:
+            field -> what it is mapped as ('unmapped' or 'unknown' when it can't be read)
+        """
+        fields = [field for field in expected_types if (index_name, field) not in self.confirmed_fields]
+        if not fields:
+            return {}
+        
+        try:
+            response = self.opensearch_client.indices.get_field_mapping(index=index_name, fields=fields)
+        except Exception as e:
+            print(f"Could not read the mapping of {', '.join(fields)} on {index_name}: {str(e)}")
+            return {field: 'unknown' for field in fields}
+        
+        mistyped = {}
+        for field in fields:
+            leaf = field.rsplit('.', 1)[-1]
+            # One entry per concrete index behind an alias
+            types = {
+                mappings.get('mappings', {}).get(field, {}).get('mapping', {}).get(leaf, {}).get('type', 'object')
+                if field in mappings.get('mappings', {}) else 'unmapped'
+                for mappings in response.values()
+            } or {'unmapped'}
+            if types <= set(expected_types[field]):
+                self.confirmed_fields.add((index_name, field))
+            else:
+                mistyped[field] = '/'.join(sorted(types))
+        
+        if mistyped:
+            print(f"WARNING: fields of {index_name} with an unexpected mapping: {mistyped}")
+        return mistyped
+    
+    def _location_filter_available(self, index_name: str, summary: Dict) -> bool:
+        """Check that `geo_distance` can run on the index; otherwise mark the summary unavailable"""
+        if not self._mistyped_fields(index_name, {'geo_location': ('geo_point',)}):
+            return True
+        
+        # geo_distance fails on a dynamically mapped {lat, lon} object - skip the
+        # filter rather than fail the request (docs/opensearch_devtools_command.md, 17c)
+        summary.update({
+            'applied': False,
+            'reason': 'unavailable: geo_location is not mapped as geo_point (reindex required)'
+        })
+        return False
+    
+    def _location_filter_stats(self, index_name: str, filter_clauses: Optional[List[Dict]],
+                               location_clause: Dict, summary: Dict) -> None:
+        """Count the candidates without coordinates, and how many of them the location filter removes"""
+        try:
+            without_coordinates = (filter_clauses or []) + [NO_GEO_LOCATION]
+            candidates_without_coordinates = self._count(index_name, without_coordinates)
+            kept = self._count(index_name, without_coordinates + [location_clause])
+            summary.update({
+                'candidates_without_coordinates': candidates_without_coordinates,
+                'candidates_removed_without_coordinates': candidates_without_coordinates - kept
+            })
+        except Exception as e:
+            # Counts are informational only - the filter is still applied
+            print(f"Location filter count failed on {index_name}: {str(e)}")
+    
+    def _skill_filter_stats(self, index_name: str, filter_clauses: Optional[List[Dict]],
+                            skill_clause: Dict, keep_uncanonicalized: bool = True) -> Dict:
+        """
+        Count how many candidates the must-have skill filter removes
+        
+        Candidates without `canonical_skills` are counted separately; with
+        `keep_uncanonicalized` they are left to the matcher (see `_skill_check`),
+        which adds the ones it rejects to `candidates_removed_by_matcher`.
+        """
+        stats = {
+            'must_have_skills': len(skill_clause['bool']['should']),
+            'min_skill_overlap': skill_clause['bool']['minimum_should_match'],
+            'uncanonicalized_candidates': 'matcher' if keep_uncanonicalized else 'excluded'
+        }
+        
+        try:
+            candidates_before = self._count(index_name, filter_clauses)
+            candidates_after = self._count(index_name, (filter_clauses or []) + [skill_clause])
+            uncanonicalized = self._count(index_name, (filter_clauses or []) + [NO_CANONICAL_SKILLS])
+            if keep_uncanonicalized:
+                candidates_after += uncanonicalized
+            stats.update({
+                'candidates_before': candidates_before,
+                'candidates_removed': candidates_before - candidates_after,
+                'candidates_remaining': candidates_after,
+                'candidates_without_canonical_skills': uncanonicalized
+            })
+        except Exception as e:
+            # Counts are informational only - the filter is still applied
+            print(f"Skill filter count failed on {index_name}: {str(e)}")
+        
+        return stats
+    
+    def _skill_check(self, skill_clause: Dict, skill_filter: Dict):
+        """
+        Python form of a must-have skill clause, applied to prepared resume profiles
+        
+        A skill is satisfied when the resume's normalized skills or their synonym
+        categories share an ID with the clause's terms, as `canonical_skills.ids` does.
+        """
+        required = [set(clause['terms']['canonical_skills.ids']) for clause in skill_clause['bool']['should']]
+        min_skill_overlap = skill_clause['bool']['minimum_should_match']
+        removed = set()  # a candidate can be seen twice (e.g. by the brute-force comparison)
+        skill_filter['candidates_removed_by_matcher'] = 0
+        
+        def check(hit: Dict) -> bool:
+            profile = hit['_profile']
+            have = profile.all_skill_categories.union(profile.skills)
+            if sum(1 for ids in required if ids & have) >= min_skill_overlap:
+                return True
+            removed.add(hit['_id'])
+            skill_filter['candidates_removed_by_matcher'] = len(removed)
+            return False
+        
+        return check
+    
+    def _count(self, index_name: str, filter_clauses: Optional[List[Dict]] = None) -> int:
+        """Number of documents in an index matching the filter clauses"""
+        query = {"match_all": {}}
+        if filter_clauses:
+            query = {"bool": {"filter": filter_clauses}}
+        
+        response = self.opensearch_client.count(index=index_name, body={"query": query})
+        return response['count']
+    
+    def _projection(self, document_type: str) -> List[str]:
+        """`_source` includes for candidate fetches, derived from the enabled scoring components"""
+        return self.matcher.source_fields(document_type)
+    
+    def _retrieve_candidates(self, index_name: str, document_type: str,
+                             query_embedding: Optional[List[float]],
+                             shortlist_size: int,
+                             filter_clauses: Optional[List[Dict]] = None) -> Tuple[List[Dict], str, Optional[str]]:
+        """
+        Fetch candidate documents for reranking.
+        
+        Uses an approximate k-NN query on the `embeddings` field when the anchor
+        document has a vector, and falls back to the legacy match_all page otherwise.
+        Filter clauses are applied inside the cluster on both paths.
+        
+        Returns:
+            (hits, mode, knn_error): mode is 'knn', 'match_all' (no query vector) or
+            'match_all_fallback' (the k-NN query failed with knn_error, e.g. because
+            `embeddings` is not mapped as knn_vector); both match_all modes only see
+            the first BRUTE_FORCE_SIZE documents
+        """
+        if query_embedding:
+            knn_clause = {
+                "vector": query_embedding,
+                "k": shortlist_size
+            }
+            if filter_clauses:
+                # Efficient k-NN filtering: the filter is applied during the graph search
+                knn_clause["filter"] = {"bool": {"filter": filter_clauses}}
+            
+            # Only IDs come back - documents are served from the corpus cache
+            knn_query = {
+                "size": shortlist_size,
+                "query": {"knn": {"embeddings": knn_clause}},
+                "_source": False
+            }
+            
+            try:
+                response = self.opensearch_client.search(index=index_name, body=knn_query)
+                doc_ids = [hit['_id'] for hit in response['hits']['hits']]
+                return self._load_candidates(index_name, document_type, doc_ids), 'knn', None
+            except Exception as e:
+                # Index may not be k-NN enabled yet - keep serving, but say the results are capped
+                print(f"WARNING: k-NN retrieval failed on {index_name}, falling back to the first "
+                      f"{BRUTE_FORCE_SIZE} documents (reindex with a knn_vector mapping): {str(e)}")
+                hits = self._brute_force_candidates(index_name, document_type, filter_clauses)
+                return hits, 'match_all_fallback', str(e)
+        
+        return self._brute_force_candidates(index_name, document_type, filter_clauses), 'match_all', None
+    
+    def _brute_force_candidates(self, index_name: str, document_type: str,
+                                filter_clauses: Optional[List[Dict]] = None) -> List[Dict]:
+        """Fetch the legacy match_all candidate page"""
+        query = {"match_all": {}}
+        if filter_clauses:
+            query = {"bool": {"filter": filter_clauses}}
+        
+        response = self.opensearch_client.search(
+            index=index_name,
+            body={
+                "query": query,
+                "size": BRUTE_FORCE_SIZE,
+                "_source": False
+            }
+        )
+        doc_ids = [hit['_id'] for hit in response['hits']['hits']]
+        return self._load_candidates(index_name, document_type, doc_ids)
+    
+    def _sync_corpus_cache(self, index_name: str) -> None:
+        """Invalidate cached documents of an index if it changed since they were cached"""
+        try:
+            response = self.opensearch_client.search(
+                index=index_name,
+                body={
+                    "size": 0,
+                    "track_total_hits": True,
+                    "aggs": {"last_processed": {"max": {"field": "processed_at"}}}
+                }
+            )
+            total = response['hits']['total']
+            version = (
+                total['value'] if isinstance(total, dict) else total,
+                response['aggregations']['last_processed'].get('value')
+            )
+        except Exception as e:
+            print(f"Error reading version of {index_name}, bypassing corpus cache: {str(e)}")
+            version = None
+        
+        self.corpus_cache.validate(index_name, version)
+    
+    def _load_candidates(self, index_name: str, document_type: str, doc_ids: List[str]) -> List[Dict]:
+        """Resolve candidate IDs to hits from the corpus cache, fetching misses with one mget"""
+        entries = {}
+        missing_ids = []
+        for doc_id in doc_ids:
+            entry = self.corpus_cache.get(index_name, doc_id)
+            if entry is None:
+                missing_ids.append(doc_id)
+            else:
+                entries[doc_id] = entry
+        
+        if missing_ids:
+            response = self.opensearch_client.mget(
+                index=index_name,
+                body={'ids': missing_ids},
+                _source_includes=self._projection(document_type)
+            )
+            for doc in response['docs']:
+                if doc.get('found'):
+                    entries[doc['_id']] = self._cache_document(
+                        index_name, document_type, doc['_id'], doc['_source']
+                    )
+        
+        return [self._hit(doc_id, entries[doc_id]) for doc_id in doc_ids if doc_id in entries]
+    
+    def _hit(self, doc_id: str, entry: Dict) -> Dict:
+        """Candidate hit carrying the compact source and the prepared scoring profile"""
+        return {'_id': doc_id, '_source': entry['source'], '_profile': entry['profile']}
+    
+    def _cache_document(self, index_name: str, document_type: str, doc_id: str, source: Dict) -> Dict:
+        """Compact and prepare a projected document, store it in the corpus cache and return the entry"""
+        entry = self.matcher.extract_features(document_type, source)
+        
+        # Rough footprint: float32 vector + metadata held as Python objects
+        size = 4 * len(entry['source'].get('embeddings', ())) + 2 * len(json.dumps(entry['source']['metadata'])) + 256
+        self.corpus_cache.put(index_name, doc_id, entry, size)
+        
+        return entry
+    
+    def _compare_with_brute_force(self, index_name: str, document_type: str,
+                                  matches: List[Dict], id_field: str,
+                                  score_hits, shortlist_ms: float,
+                                  filter_clauses: Optional[List[Dict]] = None) -> Dict:
+        """
+        Re-run the legacy match_all path and report Recall@K of the shortlist
+        ranking against it, along with the latency of both paths.
+        """
+        start = time.perf_counter()
+        brute_force_hits = self._brute_force_candidates(index_name, document_type, filter_clauses)
+        brute_force_matches = score_hits(brute_force_hits)
+        brute_force_ms = (time.perf_counter() - start) * 1000
+        
+        expected_ids = {match[id_field] for match in brute_force_matches}
+        returned_ids = {match[id_field] for match in matches}
+        recall = len(expected_ids & returned_ids) / len(expected_ids) if expected_ids else 1.0
+        
+        return {
+            'k': len(expected_ids),
+            'recall_at_k': round(recall, 4),
+            'brute_force_candidates_analyzed': len(brute_force_hits),
+            'brute_force_ms': round(brute_force_ms, 2),
+            'shortlist_ms': round(shortlist_ms, 2)
+        }
+    
+    def _stream_index(self, index_name: str, document_type: str,
+                      filter_clauses: Optional[List[Dict]] = None,
+                      page_size: int = EXHAUSTIVE_PAGE_SIZE,
+                      snapshot: Optional[Dict] = None):
+        """
+        Yield every document of an index page by page.
+        
+        A fully cached index is served from the corpus cache. Otherwise pages are
+        read from a point-in-time snapshot with search_after in `_shard_doc` order
+        (no `_id` fielddata needed), so the walk is consistent even while the
+        processors keep indexing new documents, and every page is added to the
+        cache on the way.
+        
+        `snapshot` ({'pit_id', 'keep_alive', 'search_after'}) walks a caller-owned
+        point in time instead, e.g. across the invocations of a match run; it is
+        advanced in place before each page is yielded and never deleted here.
+        """
+        if snapshot is None and not filter_clauses and self.corpus_cache.is_complete(index_name):
+            for page in self.corpus_cache.iter_pages(index_name, page_size):
+                yield [self._hit(doc_id, entry) for doc_id, entry in page]
+            return
+        
+        if snapshot is None:
+            pit_id = self.opensearch_client.create_pit(
+                index=index_name, params={'keep_alive': PIT_KEEP_ALIVE}
+            )['pit_id']
+            keep_alive, search_after = PIT_KEEP_ALIVE, None
+        else:
+            pit_id, keep_alive, search_after = snapshot['pit_id'], snapshot['keep_alive'], snapshot['search_after']
+        
+        query = {"match_all": {}}
+        if filter_clauses:
+            query = {"bool": {"filter": filter_clauses}}
+        
+        documents_walked = 0
+        try:
+            while True:
+                body = {
+                    "size": page_size,
+                    "query": query,
+                    "pit": {"id": pit_id, "keep_alive": keep_alive},
+                    "sort": [{"_shard_doc": "asc"}],
+                    "_source": {"includes": self._projection(document_type)}
+                }
+                if search_after:
+                    body["search_after"] = search_after
+                
+                response = self.opensearch_client.search(body=body)
+                hits = response['hits']['hits']
+                if not hits:
+                    break
+                
+                documents_walked += len(hits)
+                search_after = hits[-1]['sort']
+                pit_id = response.get('pit_id', pit_id)
+                if snapshot is not None:
+                    snapshot.update(pit_id=pit_id, search_after=search_after)
+                
+                yield [
+                    self._hit(hit['_id'], self._cache_document(index_name, document_type, hit['_id'], hit['_source']))
+                    for hit in hits
+                ]
+                
+                if len(hits) < page_size:
+                    break
+            
+            # Only reached when the whole index was walked
+            if snapshot is None and not filter_clauses:
+                self.corpus_cache.mark_complete(index_name, documents_walked)
+        finally:
+            if snapshot is None:
+                self._delete_pit(index_name, pit_id)
+    
+    def _delete_pit(self, index_name: str, pit_id: str) -> None:
+        """Release a point in time (it would expire on its own after its keep-alive)"""
+        try:
+            self.opensearch_client.delete_pit(body={'pit_id': [pit_id]})
+        except Exception as e:
+            print(f"Error deleting point in time for {index_name}: {str(e)}")
+    
+    def _exhaustive_top_k(self, index_name: str, document_type: str, score_hits, limit: int,
+                          filter_clauses: Optional[List[Dict]] = None, context=None,
+                          scoring_stats: Optional[Dict] = None) -> Tuple[List[Dict], Dict]:
+        """
+        Score the whole index and keep the best `limit` matches in a bounded heap.
+        
+        Memory stays O(limit + page size). The current K-th best score is handed
+        to the scorer so later pages can prune against it. The walk stops early
+        when the Lambda context does not have enough time left for another page,
+        in which case the response is flagged as incomplete.
+        """
+        start = time.perf_counter()
+        id_field = 'resume_id' if document_type == 'resume' else 'job_id'
+        heap = []  # (score, RankTieBreak, match) - min-heap of the current top-K
+        pages = 0
+        documents_scanned = 0
+        slowest_page_ms = 0.0
+        complete = True
+        
+        pages_iter = self._stream_index(index_name, document_type, filter_clauses)
+        try:
+            page_start = time.perf_counter()
+            for hits in pages_iter:
+                score_floor = heap[0][0] if limit > 0 and len(heap) >= limit else None
+                for match in score_hits(hits, score_floor, scoring_stats):
+                    entry = (match['score'], RankTieBreak(match[id_field]), match)
+                    if len(heap) < limit:
+                        heapq.heappush(heap, entry)
+                    elif entry[:2] > heap[0][:2]:
+                        heapq.heapreplace(heap, entry)
+                
+                pages += 1
+                documents_scanned += len(hits)
+                slowest_page_ms = max(slowest_page_ms, (time.perf_counter() - page_start) * 1000)
+                
+                if not self._has_time_for_page(context, slowest_page_ms):
+                    complete = False
+                    break
+                page_start = time.perf_counter()
+        finally:
+            # Releases the point in time even when the walk stops early
+            pages_iter.close()
+        
+        matches = [entry[2] for entry in sorted(heap, key=lambda entry: entry[:2], reverse=True)]
+        
+        return matches, {
+            'mode': 'exhaustive',
+            'complete': complete,
+            'pages': pages,
+            'documents_scanned': documents_scanned,
+            'filters_applied': len(filter_clauses or []),
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 2)
+        }
+    
+    def _has_time_for_page(self, context, page_ms: float) -> bool:
+        """Check whether the Lambda invocation can afford another page"""
+        if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+            return True
+        return context.get_remaining_time_in_millis() > page_ms + TIME_BUDGET_SAFETY_MS
+    
+    def _rank_hits(self, hits: List[Dict], pair_for, id_field: str, limit: int, min_score: float,
+                   score_floor: Optional[float] = None, stats: Optional[Dict] = None,
+                   semantic_scores: Optional[List[float]] = None) -> List[Dict]:
+        """
+        Score candidate hits and return the top `limit` qualifying matches, best first.
+        
+        `pair_for(profile)` maps a candidate's prepared profile to the (resume,
+        job) pair to score. Ranking runs on raw scores with a bounded min-heap; match details
+        and recommendations are left to `_explain_matches` for the final results.
+        The pruning threshold is the higher of min_score and the K-th best score
+        seen so far (or `score_floor` from earlier pages), so the cascade can stop
+        on candidates that cannot make the results. `semantic_scores`, aligned
+        with `hits` (see `_semantic_scores`), replaces the per-pair semantic
+        computation.
+        """
+        heap = []  # (score, RankTieBreak, hit, scores) - min-heap of the current top-K
+        threshold = min_score if score_floor is None else max(min_score, score_floor)
+        
+        for sequence, hit in enumerate(hits):
+            try:
+                # Calculate the scores only; explanations come later
+                precomputed = None
+                if semantic_scores is not None:
+                    precomputed = {'semantic_score': semantic_scores[sequence]}
+                scores = self.matcher.score_pair(
+                    *pair_for(hit['_profile']), min_score=threshold, precomputed=precomputed
+                )
+            except Exception as e:
+                print(f"Error calculating similarity for {id_field[:-3]} {hit['_id']}: {str(e)}")
+                # Skip this candidate if similarity calculation fails
+                continue
+            
+            if stats is not None:
+                stats['candidates_scored'] += 1
+                if scores is None:
+                    stats['candidates_pruned'] += 1
+            
+            if scores is None or scores['overall_score'] < min_score or limit <= 0:
+                continue
+            
+            entry = (scores['overall_score'], RankTieBreak(hit['_id']), hit, scores)
+            if len(heap) < limit:
+                heapq.heappush(heap, entry)
+            elif entry[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, entry)
+            
+            if len(heap) == limit:
+                threshold = max(threshold, heap[0][0])
+        
+        heap.sort(key=lambda entry: entry[:2], reverse=True)
+        return [
+            {
+                id_field: hit['_id'],
+                'score': scores['overall_score'],
+                'component_scores': scores,
+                '_source': hit['_source']  # Projected source, replaced by display fields later
+            }
+            for _, _, hit, scores in heap
+        ]
+    
+    def _ensure_scoring_script(self) -> None:
+        """Store the server-side scoring script on the cluster (once per warm container)"""
+        if SCRIPT_ID in self.stored_scripts:
+            return
+        
+        self.opensearch_client.put_script(
+            id=SCRIPT_ID,
+            body={'script': {'lang': 'painless', 'source': SCRIPT_SOURCE}}
+        )
+        self.stored_scripts.add(SCRIPT_ID)
+    
+    def _server_top_k(self, index_name: str, params: Dict, limit: int, min_score: float,
+                      filter_clauses: Optional[List[Dict]] = None) -> Tuple[List[Dict], Dict, int]:
+        """
+        Rank every (filtered) resume inside OpenSearch with the stored scoring script.
+        
+        Returns:
+            (matches best first, retrieval summary, number of candidates scored)
+        """
+        self._ensure_scoring_script()
+        
+        query = {"match_all": {}}
+        if filter_clauses:
+            query = {"bool": {"filter": filter_clauses}}
+        
+        start = time.perf_counter()
+        response = self.opensearch_client.search(
+            index=index_name,
+            body={
+                "size": limit,
+                "min_score": min_score,
+                "track_total_hits": True,
+                "query": {
+                    "script_score": {
+                        "query": query,
+                        "script": {"id": SCRIPT_ID, "params": params}
+                    }
+                },
+                "_source": RESUME_DISPLAY_FIELDS
+            }
+        )
+        scoring_ms = (time.perf_counter() - start) * 1000
+        
+        matches = [
+            {
+                'resume_id': hit['_id'],
+                'score': round(hit['_score'], 2),
+                '_source': hit.get('_source', {})
+            }
+            for hit in response['hits']['hits']
+        ]
+        
+        retrieval = {
+            'mode': 'script_score',
+            'script_id': SCRIPT_ID,
+            'filters_applied': len(filter_clauses or []),
+            'scoring_ms': round(scoring_ms, 2)
+        }
+        return matches, retrieval, response['hits']['total']['value']
+    
+    def _server_parity_check(self, index_name: str, job_data: Dict, params: Dict,
+                             matches: List[Dict]) -> Dict:
+        """
+        Compare server-side scores of the returned matches with the Python matcher.
+        
+        The Python mirror of the script separates script drift (cluster vs mirror,
+        expected ~0) from the script's intended approximation (mirror vs matcher).
+        """
+        if not matches:
+            return {'compared': 0}
+        
+        response = self.opensearch_client.mget(
+            index=index_name,
+            body={'ids': [match['resume_id'] for match in matches]},
+            _source_includes=sorted(set(self._projection('resume') + SCRIPT_FIELDS))
+        )
+        sources = {doc['_id']: doc['_source'] for doc in response['docs'] if doc.get('found')}
+        
+        matcher_diffs = []
+        mirror_diffs = []
+        python_scores = []
+        for match in matches:
+            source = sources.get(match['resume_id'])
+            if source is None:
+                continue
+            python_score = self.matcher.score_pair(source, job_data)['overall_score']
+            match['python_score'] = python_score
+            python_scores.append(python_score)
+            matcher_diffs.append(abs(match['score'] - python_score))
+            mirror_diffs.append(abs(match['score'] - round(mirror_score(params, source), 2)))
+        
+        if not matcher_diffs:
+            return {'compared': 0}
+        
+        return {
+            'compared': len(matcher_diffs),
+            'max_abs_diff_vs_python': round(max(matcher_diffs), 2),
+            'mean_abs_diff_vs_python': round(sum(matcher_diffs) / len(matcher_diffs), 2),
+            'max_abs_diff_vs_mirror': round(max(mirror_diffs), 2),
+            'same_order_as_python': python_scores == sorted(python_scores, reverse=True)
+        }
+    
+    def _semantic_scores(self, query_embedding, hits: List[Dict]) -> List[float]:
+        """Semantic scores of a normalized query embedding against candidate hits in one pass"""
+        # Candidate sources are compact corpus cache entries, already normalized
+        candidate_matrix = self.matcher.embedding_matrix([hit['_source'].get('embeddings') for hit in hits])
+        return self.matcher.semantic_scores(query_embedding, candidate_matrix)
+    
+    def _explain_matches(self, matches: List[Dict], pair_for) -> List[Dict]:
+        """Add match details and recommendations to the final matches"""
+        for match in matches:
+            match.update(self.matcher.explain(*pair_for(match['_source']), match['component_scores']))
+        return matches
+    
+    def _scoring_summary(self, stats: Dict) -> Dict:
+        """Per-request pruning statistics of the cascade scorer"""
+        scored = stats['candidates_scored']
+        return {
+            'candidates_scored': scored,
+            'candidates_pruned': stats['candidates_pruned'],
+            'pruning_rate': round(stats['candidates_pruned'] / scored, 4) if scored else 0.0
+        }
+    
+    def _hydrate_matches(self, index_name: str, document_type: str, matches: List[Dict],
+                         fetched_fields: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Replace the projected `_source` of the final matches with their display fields.
+        
+        Fields the scoring projection (or `fetched_fields`, when given) did not fetch
+        are loaded with a single `mget` for the returned matches only.
+        """
+        if document_type == 'resume':
+            id_field, display_fields = 'resume_id', RESUME_DISPLAY_FIELDS
+        else:
+            id_field, display_fields = 'job_id', JOB_DISPLAY_FIELDS
+        
+        projected = set(self._projection(document_type) if fetched_fields is None else fetched_fields)
+        missing_fields = [field for field in display_fields if field not in projected]
+        
+        # Sources may be shared with the corpus cache, so they are never modified here
+        extra_sources = {}
+        if missing_fields and matches:
+            try:
+                response = self.opensearch_client.mget(
+                    index=index_name,
+                    body={'ids': [match[id_field] for match in matches]},
+                    _source_includes=missing_fields
+                )
+                extra_sources = {
+                    doc['_id']: doc.get('_source', {})
+                    for doc in response['docs'] if doc.get('found')
+                }
+            except Exception as e:
+                print(f"Error fetching display fields from {index_name}: {str(e)}")
+        
+        for match in matches:
+            metadata = match.pop('_source', {}).get('metadata', {})
+            metadata = dict(metadata, **extra_sources.get(match[id_field], {}).get('metadata', {}))
+            if document_type == 'resume':
+                match.update({
+                    'candidate_name': metadata.get('name', 'Unknown'),
+                    'candidate_location': metadata.get('location', 'Unknown'),
+                    'candidate_skills': metadata.get('skills', []),
+                    'candidate_experience': metadata.get('total_experience_years', 0)
+                })
+            else:
+                match.update({
+                    'job_title': metadata.get('job_title', 'Unknown'),
+                    'company_name': metadata.get('company_name', 'Unknown'),
+                    'job_location': metadata.get('job_location', 'Unknown'),
+                    'skills_required': metadata.get('skills_required', []),
+                    'experience_level': metadata.get('experience_level', 'Unknown')
+                })
+        
+        return matches
+    
+    def _find_matching_jobs(self, resume_id: str, limit: int = 10, min_score: float = 50.0,
+                            shortlist_size: int = DEFAULT_SHORTLIST_SIZE,
+                            compare_brute_force: bool = False,
+                            filter_clauses: Optional[List[Dict]] = None,
+                            exhaustive: bool = False, context=None,
+                            location_filter: Optional[Dict] = None) -> Dict:
         """Find the best matching jobs for a given resume"""
         
         if not self.opensearch_client:
             return {'error': 'OpenSearch client not available'}
         
         try:
-            # Get resume document
+            job_index = os.environ.get('JOB_INDEX_NAME', 'job_descriptions')
+            
+            # Get resume document (only the fields scoring and the response need)
             resume_response = self.opensearch_client.get(
                 index=os.environ.get('RESUME_INDEX_NAME', 'resumes'),
-                id=resume_id
+                id=resume_id,
+                _source_includes=self._projection('resume') + RESUME_DISPLAY_FIELDS
             )
             resume_data = resume_response['_source']
             
-            # Search all jobs
-            job_query = {
-                "query": {"match_all": {}},
-                "size": 100  # Get up to 100 jobs to analyze
-            }
+            self._sync_corpus_cache(job_index)
             
-            job_response = self.opensearch_client.search(
-                index=os.environ.get('JOB_INDEX_NAME', 'job_descriptions'),
-                body=job_query
-            )
+            location_summary = None
+            if location_filter:
+                location_clause, location_summary = self._build_location_clause(
+                    resume_data.get('metadata', {}).get('location'), **location_filter
+                )
+                if location_clause and not self._location_filter_available(job_index, location_summary):
+                    location_clause = None
+                if location_clause:
+                    self._location_filter_stats(job_index, filter_clauses, location_clause, location_summary)
+                    filter_clauses = (filter_clauses or []) + [location_clause]
+            
+            scoring_stats = {'candidates_scored': 0, 'candidates_pruned': 0}
+            
+            # Query-side facts are derived once and reused for every candidate
+            profile_pair = self._pair_function('resume', self.matcher.prepare_resume(resume_data))
+            source_pair = self._pair_function('resume', resume_data)
             
-            # Calculate similarity scores for each job
-            matches = []
-            for hit in job_response['hits']['hits']:
-                job_data = hit['_source']
-                job_id = hit['_id']
+            query_embedding = self.matcher.normalize_embedding(resume_data.get('embeddings'))
+            
+            def score_hits(hits, score_floor=None, stats=None):
+                semantic_scores = self._semantic_scores(query_embedding, hits)
+                return self._rank_hits(hits, profile_pair, 'job_id', limit, min_score, score_floor, stats,
+                                       semantic_scores)
+            
+            if exhaustive:
+                # Exact ranking over the whole index, streamed page by page
+                matches, retrieval = self._exhaustive_top_k(
+                    job_index, 'job_description', score_hits, limit, filter_clauses, context, scoring_stats
+                )
+                jobs_analyzed = retrieval['documents_scanned']
+            else:
+                # Stage 1: semantic shortlist anchored on the resume vector
+                retrieval_start = time.perf_counter()
+                job_hits, retrieval_mode, knn_error = self._retrieve_candidates(
+                    job_index, 'job_description', resume_data.get('embeddings'), shortlist_size, filter_clauses
+                )
+                retrieval_ms = (time.perf_counter() - retrieval_start) * 1000
                 
-                try:
-                    # Calculate detailed similarity with error handling
-                    similarity_result = self.matcher.calculate_similarity_score(resume_data, job_data)
-                    
-                    if similarity_result['overall_score'] >= min_score:
-                        matches.append({
-                            'job_id': job_id,
-                            'score': similarity_result['overall_score'],
-                            'component_scores': similarity_result['component_scores'],
-                            'match_details': similarity_result['match_details'],
-                            'recommendations': similarity_result['recommendations'],
-                            'job_title': job_data.get('metadata', {}).get('job_title', 'Unknown'),
-                            'company_name': job_data.get('metadata', {}).get('company_name', 'Unknown'),
-                            'job_location': job_data.get('metadata', {}).get('job_location', 'Unknown'),
-                            'skills_required': job_data.get('metadata', {}).get('skills_required', []),
-                            'experience_level': job_data.get('metadata', {}).get('experience_level', 'Unknown')
-                        })
-                except Exception as e:
-                    print(f"Error calculating similarity for job {job_id}: {str(e)}")
-                    # Skip this job if similarity calculation fails
-                    continue
+                # Stage 2: rerank the shortlist with the multi-factor matcher
+                scoring_start = time.perf_counter()
+                matches = score_hits(job_hits, stats=scoring_stats)
+                scoring_ms = (time.perf_counter() - scoring_start) * 1000
+                
+                jobs_analyzed = len(job_hits)
+                retrieval = {
+                    'mode': retrieval_mode,
+                    'shortlist_size': shortlist_size,
+                    'filters_applied': len(filter_clauses or []),
+                    'retrieval_ms': round(retrieval_ms, 2),
+                    'scoring_ms': round(scoring_ms, 2)
+                }
+                if knn_error:
+                    retrieval['knn_error'] = knn_error
+                    retrieval['candidate_limit'] = BRUTE_FORCE_SIZE
             
-            # Sort by score and limit results
-            matches.sort(key=lambda x: x['score'], reverse=True)
-            matches = matches[:limit]
+            # Explanations and display-only fields are built for the returned matches alone
+            matches = self._explain_matches(matches, source_pair)
+            matches = self._hydrate_matches(job_index, 'job_description', matches)
             
-            return {
+            result = {
                 'resume_id': resume_id,
                 'candidate_name': resume_data.get('metadata', {}).get('name', 'Unknown'),
-                'total_jobs_analyzed': len(job_response['hits']['hits']),
+                'total_jobs_analyzed': jobs_analyzed,
                 'matching_jobs': len(matches),
-                'matches': matches
+                'matches': matches,
+                'retrieval': retrieval,
+                'scoring_stats': self._scoring_summary(scoring_stats)
             }
             
+            if location_summary:
+                result['location_filter'] = location_summary
+            
+            if compare_brute_force and not exhaustive:
+                result['brute_force_comparison'] = self._compare_with_brute_force(
+                    job_index, 'job_description', matches, 'job_id', score_hits,
+                    retrieval_ms + scoring_ms, filter_clauses
+                )
+            
+            return result
+            
         except Exception as e:
             return {'error': f'Error finding matching jobs: {str(e)}'}
     
+    def _batch_match(self, job_ids: List[str], resume_ids: List[str], limit: int,
+                     min_score: float, context=None) -> Dict:
+        """
+        Rank candidates for several query documents in one pass over the candidates.
+        
+        With job_ids, every job is ranked against the given resume_ids (or the whole
+        resume index when none are given); with only resume_ids, every resume is
+        ranked against the whole job index. Query documents come from one `mget`,
+        each candidate page is read once (from the corpus cache when warm) and the
+        semantic component of a page is scored per query in a single pass.
+        """
+        if not self.opensearch_client:
+            return {'error': 'OpenSearch client not available'}
+        
+        try:
+            roles = self._batch_roles(job_ids, resume_ids)
+            query_type, query_field = roles['query_type'], roles['query_field']
+            candidate_index, candidate_type, id_field = roles['candidate_index'], roles['candidate_type'], roles['id_field']
+            
+            queries, not_found = self._load_queries(
+                roles['query_index'], query_type, roles['query_ids'], roles['display_fields']
+            )
+            
+            self._sync_corpus_cache(candidate_index)
+            
+            start = time.perf_counter()
+            scoring_stats = {'candidates_scored': 0, 'candidates_pruned': 0}
+            candidates_analyzed = 0
+            slowest_page_ms = 0.0
+            complete = True
+            
+            pages_iter = self._candidate_pages(candidate_index, candidate_type, roles['candidate_ids'])
+            try:
+                page_start = time.perf_counter()
+                for hits in pages_iter:
+                    if not queries:
+                        break
+                    self._score_page(hits, queries, id_field, limit, min_score, scoring_stats)
+                    
+                    candidates_analyzed += len(hits)
+                    slowest_page_ms = max(slowest_page_ms, (time.perf_counter() - page_start) * 1000)
+                    
+                    if not self._has_time_for_page(context, slowest_page_ms):
+                        complete = False
+                        break
+                    page_start = time.perf_counter()
+            finally:
+                pages_iter.close()
+            
+            # Explanations for the returned matches, display fields in one mget
+            all_matches = []
+            for query in queries:
+                query['matches'] = self._explain_matches(
+                    [entry[2] for entry in sorted(query['heap'], key=lambda entry: entry[:2], reverse=True)],
+                    query['source_pair']
+                )
+                all_matches.extend(query['matches'])
+            self._hydrate_matches(candidate_index, candidate_type, all_matches)
+            
+            count_field = 'qualified_candidates' if query_type == 'job_description' else 'matching_jobs'
+            results = [
+                dict(self._query_summary(query_type, query), **{
+                    count_field: len(query['matches']),
+                    'matches': query['matches']
+                })
+                for query in queries
+            ]
+            
+            return {
+                'query_type': query_field,
+                'total_candidates_analyzed': candidates_analyzed,
+                'results': results,
+                'not_found': not_found,
+                'complete': complete,
+                'scoring_stats': self._scoring_summary(scoring_stats),
+                'elapsed_ms': round((time.perf_counter() - start) * 1000, 2)
+            }
+            
+        except Exception as e:
+            return {'error': f'Error in batch matching: {str(e)}'}
+    
+    def _batch_roles(self, job_ids: List[str], resume_ids: List[str]) -> Dict:
+        """
+        Which side of a batch is queried and which is ranked.
+        
+        With job_ids, jobs are the queries and resumes (resume_ids, or the whole
+        index) the candidates; with only resume_ids, every resume is ranked against
+        the whole job index.
+        """
+        resume_index = os.environ.get('RESUME_INDEX_NAME', 'resumes')
+        job_index = os.environ.get('JOB_INDEX_NAME', 'job_descriptions')
+        
+        if job_ids:
+            return {
+                'query_index': job_index, 'query_type': 'job_description', 'query_ids': job_ids,
+                'query_field': 'job_id', 'display_fields': JOB_DISPLAY_FIELDS,
+                'candidate_index': resume_index, 'candidate_type': 'resume', 'candidate_ids': resume_ids,
+                'id_field': 'resume_id'
+            }
+        return {
+            'query_index': resume_index, 'query_type': 'resume', 'query_ids': resume_ids,
+            'query_field': 'resume_id', 'display_fields': RESUME_DISPLAY_FIELDS,
+            'candidate_index': job_index, 'candidate_type': 'job_description', 'candidate_ids': [],
+            'id_field': 'job_id'
+        }
+    
+    def _load_queries(self, query_index: str, query_type: str, query_ids: List[str],
+                      display_fields: List[str]) -> Tuple[List[Dict], List[str]]:
+        """
+        Fetch the query documents of a batch in one round trip and prepare them for scoring.
+        
+        Returns:
+            (queries, ids that were not found); each query carries its profile pair,
+            normalized embedding and an empty top-K heap
+        """
+        response = self.opensearch_client.mget(
+            index=query_index,
+            body={'ids': list(dict.fromkeys(query_ids))},
+            _source_includes=self._projection(query_type) + display_fields
+        )
+        queries = []
+        not_found = []
+        for doc in response['docs']:
+            if not doc.get('found'):
+                not_found.append(doc['_id'])
+                continue
+            source = doc['_source']
+            if query_type == 'job_description':
+                profile = self.matcher.prepare_job(source)
+            else:
+                profile = self.matcher.prepare_resume(source)
+            queries.append({
+                'id': doc['_id'],
+                'source': source,
+                'embedding': self.matcher.normalize_embedding(source.get('embeddings')),
+                'profile_pair': self._pair_function(query_type, profile),
+                'source_pair': self._pair_function(query_type, source),
+                'heap': []  # (score, RankTieBreak, match) - min-heap of the current top-K
+            })
+        return queries, not_found
+    
+    def _score_page(self, hits: List[Dict], queries: List[Dict], id_field: str, limit: int,
+                    min_score: float, scoring_stats: Optional[Dict] = None) -> None:
+        """Score one candidate page for every query, updating each query's top-K heap"""
+        # One (N x d) matrix per page, shared by every query
+        candidate_matrix = self.matcher.embedding_matrix(
+            [hit['_source'].get('embeddings') for hit in hits]
+        )
+        
+        for query in queries:
+            semantic_scores = self.matcher.semantic_scores(query['embedding'], candidate_matrix)
+            heap = query['heap']
+            score_floor = heap[0][0] if limit > 0 and len(heap) >= limit else None
+            
+            for match in self._rank_hits(hits, query['profile_pair'], id_field, limit, min_score,
+                                         score_floor, scoring_stats, semantic_scores):
+                entry = (match['score'], RankTieBreak(match[id_field]), match)
+                if len(heap) < limit:
+                    heapq.heappush(heap, entry)
+                elif entry[:2] > heap[0][:2]:
+                    heapq.heapreplace(heap, entry)
+    
+    def _query_summary(self, query_type: str, query: Dict) -> Dict:
+        """Identify a batch query document in results"""
+        metadata = query['source'].get('metadata', {})
+        if query_type == 'job_description':
+            return {'job_id': query['id'], 'job_title': metadata.get('job_title', 'Unknown')}
+        return {'resume_id': query['id'], 'candidate_name': metadata.get('name', 'Unknown')}
+    
+    def _pair_function(self, query_type: str, query):
+        """
+        Map a candidate to the (resume, job) pair it forms with the query document.
+        
+        Works for sources (explanations) and prepared profiles (scoring) alike.
+        """
+        if query_type == 'job_description':
+            return lambda resume: (resume, query)
+        return lambda job: (query, job)
+    
+    def _candidate_pages(self, index_name: str, document_type: str, candidate_ids: List[str],
+                         cursor: Optional[Dict] = None):
+        """
+        Candidate pages of a batch: the given ids, or every document of the index
+        
+        `cursor` makes the walk resumable and is advanced in place before each page
+        is yielded: {'after_id'} over given ids (expected in sorted order), or a
+        point-in-time snapshot (see _stream_index) over the whole index.
+        """
+        if candidate_ids:
+            if cursor is not None and cursor.get('after_id') is not None:
+                candidate_ids = [doc_id for doc_id in candidate_ids if doc_id > cursor['after_id']]
+            if candidate_ids:
+                if cursor is not None:
+                    cursor['after_id'] = candidate_ids[-1]
+                yield self._load_candidates(index_name, document_type, list(dict.fromkeys(candidate_ids)))
+        else:
+            yield from self._stream_index(index_name, document_type, snapshot=cursor)
+    
+    def _get_run(self, run_id: str) -> Optional[Dict]:
+        """Stored state of a match run, or None when it does not exist"""
+        try:
+            return self.opensearch_client.get(index=MATCH_RUNS_INDEX, id=run_id)['_source']
+        except NotFoundError:
+            return None
+    
+    def _save_run(self, run: Dict, queries: Optional[List[Dict]] = None,
+                  roles: Optional[Dict] = None) -> None:
+        """
+        Write a match run back to the match runs index
+        
+        With queries, their current top-K heaps replace the stored results; only
+        ids, scores and component scores are stored - display fields are fetched
+        when results are read.
+        """
+        if not self.runs_index_ready:
+            if not self.opensearch_client.indices.exists(index=MATCH_RUNS_INDEX):
+                self.opensearch_client.indices.create(
+                    index=MATCH_RUNS_INDEX,
+                    body={'mappings': {'properties': MATCH_RUNS_PROPERTIES}}
+                )
+            self.runs_index_ready = True
+        
+        if queries is not None:
+            id_field = roles['id_field']
+            run['results'] = [
+                dict(self._query_summary(roles['query_type'], query), matches=[
+                    {
+                        id_field: match[id_field],
+                        'score': match['score'],
+                        'component_scores': match['component_scores']
+                    }
+                    for _, _, match in sorted(query['heap'], key=lambda entry: entry[:2], reverse=True)
+                ])
+                for query in queries
+            ]
+        run['updated_at'] = datetime.utcnow().isoformat()
+        self.opensearch_client.index(index=MATCH_RUNS_INDEX, id=run['run_id'], body=run)
+    
+    def _restore_heaps(self, queries: List[Dict], results: List[Dict], query_field: str,
+                       id_field: str) -> None:
+        """Seed the top-K heaps of a continued run with its stored (best-first) matches"""
+        stored = {result[query_field]: result['matches'] for result in results}
+        for query in queries:
+            matches = stored.get(query['id'], [])
+            query['heap'] = [(match['score'], RankTieBreak(match[id_field]), match) for match in matches]
+            heapq.heapify(query['heap'])
+    
+    def _run_cursor(self, candidate_index: str, candidate_ids: List[str]) -> Dict:
+        """
+        Starting cursor of a match run
+        
+        A whole-index run walks one point-in-time snapshot across all of its
+        worker invocations; its `_shard_doc` sort values are only meaningful
+        within that snapshot.
+        """
+        if candidate_ids:
+            return {'after_id': None}
+        pit_id = self.opensearch_client.create_pit(
+            index=candidate_index, params={'keep_alive': RUN_PIT_KEEP_ALIVE}
+        )['pit_id']
+        return {'pit_id': pit_id, 'keep_alive': RUN_PIT_KEEP_ALIVE, 'search_after': None}
+    
+    def _release_run_snapshot(self, run: Dict) -> None:
+        """Delete the point in time of a finished run"""
+        cursor = run.get('cursor') or {}
+        if cursor.get('pit_id'):
+            roles = self._batch_roles(run['request']['job_ids'], run['request']['resume_ids'])
+            self._delete_pit(roles['candidate_index'], cursor['pit_id'])
+            cursor['pit_id'] = None
+    
+    def _invoke_worker(self, run_id: str, context=None) -> None:
+        """Hand a match run to an asynchronous invocation of this function"""
+        function_name = (
+            os.environ.get('MATCH_WORKER_FUNCTION_NAME')
+            or getattr(context, 'function_name', None)
+            or os.environ.get('AWS_LAMBDA_FUNCTION_NAME')
+        )
+        if not function_name:
+            raise RuntimeError('No function name to invoke the match worker with')
+        
+        if self.lambda_client is None:
+            self.lambda_client = boto3.client('lambda')
+        self.lambda_client.invoke(
+            FunctionName=function_name,
+            InvocationType='Event',
+            Payload=json.dumps({'action': MATCH_WORKER_ACTION, 'run_id': run_id}).encode('utf-8')
+        )
+    
     def _analyze_specific_match(self, resume_id: str, job_id: str) -> Dict:
         """Analyze detailed match between specific resume and job"""
         
@@ -323,8 +2029,8 @@ class LambdaSimilarityAPI:
         
         try:
             # Get both documents
-            resume_response = self.opensearch_client.get(index=os.environ.get('RESUME_INDEX_NAME', 'resumes'), id=resume_id)
-            job_response = self.opensearch_client.get(index=os.environ.get('JOB_INDEX_NAME', 'job_descriptions'), id=job_id)
+            resume_response = self.opensearch_client.get(index=os.environ.get('RESUME_INDEX_NAME', 'resumes'), id=resume_id, _source_excludes=['text_content'])
+            job_response = self.opensearch_client.get(index=os.environ.get('JOB_INDEX_NAME', 'job_descriptions'), id=job_id, _source_excludes=['text_content'])
             
             resume_data = resume_response['_source']
             job_data = job_response['_source']
@@ -377,30 +2083,8 @@ def lambda_handler(event, context):
         path = 'UNKNOWN'
         body = {}
         
-        # Check if this is a direct body pass-through (non-proxy integration)
-        if isinstance(event, dict) and 'resume_id' in event and 'job_id' in event:
-            # API Gateway is passing the body directly for /match/detailed (both IDs present)
-            http_method = 'POST'
-            path = '/match/detailed'
-            body = event
-            print("Detected: Direct body pass-through for /match/detailed")
-        
-        elif isinstance(event, dict) and 'resume_id' in event:
-            # API Gateway is passing the body directly for /search/jobs
-            http_method = 'POST'
-            path = '/search/jobs'
-            body = event
-            print("Detected: Direct body pass-through for /search/jobs")
-        
-        elif isinstance(event, dict) and 'job_id' in event:
-            # API Gateway is passing the body directly for /search/resumes
-            http_method = 'POST'
-            path = '/search/resumes'
-            body = event
-            print("Detected: Direct body pass-through for /search/resumes")
-        
-        # Handle standard API Gateway event formats
-        elif 'httpMethod' in event:
+        # API Gateway events route on their method and path, whatever the body holds
+        if 'httpMethod' in event:
             # API Gateway REST API format
             http_method = event['httpMethod']
             path = event.get('path', '')
@@ -448,6 +2132,35 @@ def lambda_handler(event, context):
                 else:
                     body = event['body']
         
+        # Asynchronous worker invocation of a match run (see _invoke_worker)
+        elif event.get('action') == MATCH_WORKER_ACTION:
+            return api_instance.run_match_job(event['run_id'], context)
+        
+        # Check if this is a direct body pass-through (non-proxy integration).
+        # A bare body of job_ids/resume_ids could be /match/batch or /match/jobs, so
+        # those endpoints need the method and path (proxy integration, or a mapping
+        # template passing httpMethod, path and body)
+        elif isinstance(event, dict) and 'resume_id' in event and 'job_id' in event:
+            # API Gateway is passing the body directly for /match/detailed (both IDs present)
+            http_method = 'POST'
+            path = '/match/detailed'
+            body = event
+            print("Detected: Direct body pass-through for /match/detailed")
+        
+        elif isinstance(event, dict) and 'resume_id' in event:
+            # API Gateway is passing the body directly for /search/jobs
+            http_method = 'POST'
+            path = '/search/jobs'
+            body = event
+            print("Detected: Direct body pass-through for /search/jobs")
+        
+        elif isinstance(event, dict) and 'job_id' in event:
+            # API Gateway is passing the body directly for /search/resumes
+            http_method = 'POST'
+            path = '/search/resumes'
+            body = event
+            print("Detected: Direct body pass-through for /search/resumes")
+        
         else:
             # Direct Lambda invocation or unknown format
             http_method = event.get('httpMethod', 'UNKNOWN')
@@ -464,14 +2177,24 @@ def lambda_handler(event, context):
             return api_instance.health_check()
         
         elif http_method == 'POST' and path == '/search/resumes':
-            return api_instance.search_resumes_for_job(body)
+            return api_instance.search_resumes_for_job(body, context)
         
         elif http_method == 'POST' and path == '/search/jobs':
-            return api_instance.search_jobs_for_resume(body)
+            return api_instance.search_jobs_for_resume(body, context)
         
         elif http_method == 'POST' and path == '/match/detailed':
             return api_instance.detailed_match_analysis(body)
         
+        elif http_method == 'POST' and path == '/match/batch':
+            return api_instance.batch_match(body, context)
+        
+        elif http_method == 'POST' and path == '/match/jobs':
+            return api_instance.start_match_run(body, context)
+        
+        elif http_method == 'GET' and path.startswith('/match/jobs/'):
+            run_id = (event.get('pathParameters') or {}).get('run_id') or path.rstrip('/').split('/')[-1]
+            return api_instance.get_match_run(run_id, event.get('queryStringParameters'))
+        
         else:
             return {
                 'statusCode': 404,
@@ -484,7 +2207,10 @@ def lambda_handler(event, context):
                         'GET /health',
                         'POST /search/resumes',
                         'POST /search/jobs', 
-                        'POST /match/detailed'
+                        'POST /match/detailed',
+                        'POST /match/batch',
+                        'POST /match/jobs',
+                        'GET /match/jobs/{run_id}'
                     ]
                 }),
                 'headers': {'Content-Type': 'application/json'}
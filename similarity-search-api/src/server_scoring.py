@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Server-side resume scoring for the Similarity Search API
+A stored Painless script_score that ranks resumes inside OpenSearch, plus a
+Python mirror of the same script used for parity checks
+"""
+
+import hashlib
+from typing import Dict
+
+import numpy as np
+
+from advanced_matcher import (
+    DISTANCE_BANDS, FAR_DISTANCE_SCORE, UNKNOWN_DISTANCE_SCORE, AdvancedMatcher, haversine_km
+)
+from gazetteer import city_coordinates
+
+# Resume fields the script reads (all written by the resume processor at ingest),
+# with the mapped types its doc-value accessors work on. A field first written
+# without its explicit mapping (text, an object, a float array) fails the script
+# and only a reindex changes it
+SCRIPT_FIELD_TYPES = {
+    'canonical_skills.skills': ('keyword',),
+    'canonical_skills.categories': ('keyword',),
+    'experience_years': ('float', 'double', 'long'),
+    'location_normalized': ('keyword',),
+    'geo_location': ('geo_point',),  # arcDistance
+    'degree_level': ('integer', 'long'),
+    'has_education': ('boolean',),
+    'industry_tags': ('keyword',),
+    'has_experience': ('boolean',),
+    'embeddings': ('knn_vector',)  # cosineSimilarity
+}
+SCRIPT_FIELDS = list(SCRIPT_FIELD_TYPES)
+
+# The weighted formula of AdvancedMatcher over the precomputed resume fields.
+# Differences from the Python matcher: fuzzy skill and education matches are not
+# credited (only exact/synonym skills and degree levels), and distances come from
+# the cluster's arcDistance instead of the gazetteer table.
+SCRIPT_SOURCE = """
+double skills = 50.0;
+if (params.required_skills.size() > 0) {
+    def skillSet = doc['canonical_skills.skills'];
+    def categorySet = doc['canonical_skills.categories'];
+    double total = 0.0;
+    for (def required : params.required_skills) {
+        if (skillSet.contains(required[0])) {
+            total += 100.0;
+            continue;
+        }
+        for (int i = 1; i < required.size(); i++) {
+            if (categorySet.contains(required[i])) {
+                total += 85.0;
+                break;
+            }
+        }
+    }
+    skills = Math.min(total / params.required_skills.size(), 100.0);
+}
+
+double experience = 50.0;
+if (params.exp_min != null && params.exp_max != null) {
+    double years = doc['experience_years'].size() > 0 ? doc['experience_years'].value : 0.0;
+    double low = params.exp_min;
+    double high = params.exp_max;
+    if (years >= low && years <= high) {
+        experience = 100.0;
+    } else if (years < low) {
+        double gap = low - years;
+        experience = gap <= 1 ? 80.0 : (gap <= 2 ? 60.0 : Math.max(20.0, 100 - gap * 15));
+    } else {
+        double excess = years - high;
+        experience = excess <= 2 ? 90.0 : (excess <= 5 ? 75.0 : Math.max(50.0, 100 - excess * 5));
+    }
+}
+
+double location = 50.0;
+String resumeLocation = doc['location_normalized'].size() > 0 ? doc['location_normalized'].value : '';
+if (!resumeLocation.isEmpty() && !params.job_location.isEmpty()) {
+    String[] parts = resumeLocation.splitOnToken(',');
+    if (params.job_remote) {
+        location = 100.0;
+    } else if (resumeLocation.contains('remote')) {
+        location = 90.0;
+    } else if (resumeLocation == params.job_location) {
+        location = 100.0;
+    } else if (parts[0].trim() == params.job_city) {
+        location = 95.0;
+    } else if (parts.length > 1 && params.job_region != null && parts[1].trim() == params.job_region) {
+        location = 75.0;
+    } else if (params.job_lat != null && doc['geo_location'].size() > 0) {
+        double km = doc['geo_location'].arcDistance(params.job_lat, params.job_lon) / 1000.0;
+        location = params.far_score;
+        for (def band : params.bands) {
+            if (km <= band[0]) {
+                location = band[1];
+                break;
+            }
+        }
+    } else {
+        location = params.unknown_score;
+    }
+}
+
+double education = 75.0;
+if (params.education.size() > 0) {
+    if (doc['has_education'].size() == 0 || !doc['has_education'].value) {
+        education = 30.0;
+    } else {
+        long level = doc['degree_level'].size() > 0 ? doc['degree_level'].value : 0;
+        double total = 0.0;
+        for (def requirement : params.education) {
+            if (level >= requirement[0]) {
+                total += 100.0;
+            } else if (level >= requirement[1]) {
+                total += 90.0;
+            }
+        }
+        education = total / params.education.size();
+    }
+}
+
+double semantic = 50.0;
+if (params.query_vector != null && doc['embeddings'].size() > 0) {
+    double cosine = cosineSimilarity(params.query_vector, doc['embeddings']);
+    semantic = Math.max(0.0, Math.min(100.0, (cosine + 1) / 2 * 100));
+}
+
+double industry = 50.0;
+if (doc['has_experience'].size() > 0 && doc['has_experience'].value) {
+    if (params.industry == null) {
+        industry = 60.0;
+    } else {
+        industry = doc['industry_tags'].contains(params.industry) ? 85.0 : 40.0;
+    }
+}
+
+def weights = params.weights;
+return weights.skills_score * skills + weights.experience_score * experience
+    + weights.location_score * location + weights.education_score * education
+    + weights.semantic_score * semantic + weights.industry_score * industry
+    + weights.salary_score * params.salary_score;
+"""
+
+# Content-addressed ID: a changed script is stored under a new ID, so warm
+# containers running the old code keep using the old script
+SCRIPT_ID = 'resume-match-score-' + hashlib.sha1(SCRIPT_SOURCE.encode('utf-8')).hexdigest()[:12]
+
+# Parity between mirror_score and AdvancedMatcher.score_pair, in overall-score points.
+# Pairs scored without fuzzy matches agree up to the matcher's rounding to 2 decimals;
+# otherwise the mirror can only score lower, by the uncredited fuzzy credit (at most
+# 100 per required skill or education requirement, weighted by its component)
+SCORE_ROUNDING_TOLERANCE = 0.005
+
+def fuzzy_match_tolerance(weights: Dict) -> float:
+    """Largest amount the mirror may score below the matcher, for the given component weights"""
+    return 100.0 * (weights['skills_score'] + weights['education_score']) + SCORE_ROUNDING_TOLERANCE
+
+def script_params(matcher: AdvancedMatcher, job_data: Dict) -> Dict:
+    """Job-side parameters of the stored script, derived like the matcher's JobProfile"""
+    job = matcher.prepare_job(job_data)
+    coordinates = city_coordinates(job.location) if job.city_id is not None else None
+    query_embedding = matcher.normalize_embedding(job_data.get('embeddings'))
+
+    return {
+        'weights': dict(matcher.weights),
+        'required_skills': [
+            [skill] + list(categories)
+            for skill, categories in zip(job.required_skills, job.required_skill_categories)
+        ],
+        'exp_min': job.experience_range[0] if job.experience_range else None,
+        'exp_max': job.experience_range[1] if job.experience_range else None,
+        'job_location': job.location,
+        'job_city': job.location_parts[0],
+        'job_region': job.location_parts[1] if len(job.location_parts) > 1 else None,
+        'job_remote': job.is_remote,
+        'job_lat': coordinates[0] if coordinates else None,
+        'job_lon': coordinates[1] if coordinates else None,
+        'bands': [[max_km, score] for max_km, score in DISTANCE_BANDS],
+        'far_score': FAR_DISTANCE_SCORE,
+        'unknown_score': UNKNOWN_DISTANCE_SCORE,
+        'education': [[full_credit, diploma] for _, full_credit, diploma in job.education_requirements],
+        'industry': job.industry,
+        'salary_score': job.salary_score,
+        'query_vector': query_embedding.tolist() if query_embedding is not None else None
+    }
+
+def mirror_score(params: Dict, resume: Dict) -> float:
+    """
+    Python mirror of SCRIPT_SOURCE over a resume `_source`
+
+    Used to tell script drift (cluster vs mirror) apart from the intended
+    approximation (mirror vs AdvancedMatcher) in parity checks.
+    """
+    canonical_skills = resume.get('canonical_skills') or {}
+    skill_set = set(canonical_skills.get('skills') or [])
+    category_set = set(canonical_skills.get('categories') or [])
+
+    skills = 50.0
+    if params['required_skills']:
+        total = 0.0
+        for required in params['required_skills']:
+            if required[0] in skill_set:
+                total += 100.0
+            elif any(category in category_set for category in required[1:]):
+                total += 85.0
+        skills = min(total / len(params['required_skills']), 100.0)
+
+    experience = 50.0
+    if params['exp_min'] is not None and params['exp_max'] is not None:
+        years = resume.get('experience_years') or 0.0
+        low, high = params['exp_min'], params['exp_max']
+        if low <= years <= high:
+            experience = 100.0
+        elif years < low:
+            gap = low - years
+            experience = 80.0 if gap <= 1 else 60.0 if gap <= 2 else max(20.0, 100 - gap * 15)
+        else:
+            excess = years - high
+            experience = 90.0 if excess <= 2 else 75.0 if excess <= 5 else max(50.0, 100 - excess * 5)
+
+    location = 50.0
+    resume_location = resume.get('location_normalized') or ''
+    if resume_location and params['job_location']:
+        parts = resume_location.split(',')
+        geo = resume.get('geo_location')
+        if params['job_remote']:
+            location = 100.0
+        elif 'remote' in resume_location:
+            location = 90.0
+        elif resume_location == params['job_location']:
+            location = 100.0
+        elif parts[0].strip() == params['job_city']:
+            location = 95.0
+        elif len(parts) > 1 and params['job_region'] is not None and parts[1].strip() == params['job_region']:
+            location = 75.0
+        elif params['job_lat'] is not None and geo:
+            km = float(haversine_km(geo['lat'], geo['lon'], params['job_lat'], params['job_lon']))
+            location = next((score for max_km, score in params['bands'] if km <= max_km), params['far_score'])
+        else:
+            location = params['unknown_score']
+
+    education = 75.0
+    if params['education']:
+        if not resume.get('has_education'):
+            education = 30.0
+        else:
+            level = resume.get('degree_level') or 0
+            total = 0.0
+            for full_credit, diploma in params['education']:
+                if level >= full_credit:
+                    total += 100.0
+                elif level >= diploma:
+                    total += 90.0
+            education = total / len(params['education'])
+
+    semantic = 50.0
+    embedding = resume.get('embeddings')
+    if params['query_vector'] is not None and embedding is not None and len(embedding):
+        query = np.asarray(params['query_vector'], dtype=np.float64)
+        vector = np.asarray(embedding, dtype=np.float64)
+        cosine = float(query @ vector / (np.linalg.norm(query) * np.linalg.norm(vector)))
+        semantic = max(0.0, min(100.0, (cosine + 1) / 2 * 100))
+
+    industry = 50.0
+    if resume.get('has_experience'):
+        if params['industry'] is None:
+            industry = 60.0
+        else:
+            industry = 85.0 if params['industry'] in (resume.get('industry_tags') or []) else 40.0
+
+    weights = params['weights']
+    return (
+        weights['skills_score'] * skills + weights['experience_score'] * experience
+        + weights['location_score'] * location + weights['education_score'] * education
+        + weights['semantic_score'] * semantic + weights['industry_score'] * industry
+        + weights['salary_score'] * params['salary_score']
+    )
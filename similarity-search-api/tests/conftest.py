@@ -0,0 +1,23 @@
+import os
+import sys
+from unittest import mock
+
+import pytest
+
+# The Lambda code is deployed flat from src/, so the tests import its modules the same way
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# lambda_function builds its module-level API instance (and a signed client) on import
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+@pytest.fixture
+def api():
+    """A LambdaSimilarityAPI with a mocked OpenSearch client and an empty corpus cache"""
+    import lambda_function
+
+    with mock.patch.object(lambda_function.LambdaSimilarityAPI, '_initialize_opensearch', return_value=None):
+        instance = lambda_function.LambdaSimilarityAPI()
+    instance.opensearch_client = mock.MagicMock()
+    return instance
@@ -0,0 +1,210 @@
+"""
+Scoring invariants of the AdvancedMatcher cascade
+"""
+
+import difflib
+import heapq
+import random
+
+import pytest
+
+from advanced_matcher import FUZZY_SKILL_MATCH_SCORE, AdvancedMatcher, SkillGramIndex, skill_grams
+from document_features import SKILL_SYNONYMS, normalize_skill, skill_ratio
+from lambda_function import RankTieBreak
+
+SKILLS = ['Python', 'AWS', 'Docker', 'SQL', 'Django', 'React', 'Java', 'Kubernetes', 'Machine Learning',
+          'Git', 'Linux', 'Node.js', 'Flask', 'Spring', 'TensorFlow', 'PostgreSQL', 'Jenkins', 'Scrum',
+          'Terraforms', 'Pythn', 'Dockerr']
+CITIES = ['Mumbai, India', 'Delhi, India', 'Bangalore, India', 'Pune, India', 'Remote', 'Lucknow, India',
+          'Thane', 'Atlantis']
+DEGREES = ["Bachelor's in Computer Science", 'Master of Technology', 'PhD in Physics', 'Diploma in IT', 'B.Tech']
+LEVELS = ['Entry level', 'Mid-level', 'Senior (5+ years)', '3-6 years', 'Lead', '']
+REQUIREMENTS = [["Bachelor's degree in CS", '5+ years'], ["Master's degree"], [], ["PhD or Master's"], ['Diploma']]
+
+def vector(rng, dim=8):
+    return [rng.uniform(-1, 1) for _ in range(dim)]
+
+def make_corpus(seed=7, resumes=150, jobs=12):
+    """Seeded resumes and jobs covering every branch of every component"""
+    rng = random.Random(seed)
+    resume_docs = {
+        f'r{i:03d}': {
+            'metadata': {
+                'skills': rng.sample(SKILLS, rng.randint(0, 8)),
+                'total_experience_years': rng.randint(0, 15),
+                'location': rng.choice(CITIES),
+                'experience': rng.choice([[], [{'company': rng.choice(['Tech Corp', 'BankCo', 'MediHealth']),
+                                                'position': rng.choice(['Software Engineer', 'Analyst'])}]]),
+                'education': rng.choice([[], [{'degree': rng.choice(DEGREES)}]])
+            },
+            'embeddings': rng.choice([None, vector(rng)])
+        }
+        for i in range(resumes)
+    }
+    job_docs = {
+        f'j{i:02d}': {
+            'metadata': {
+                'job_title': rng.choice(['Senior Python Developer', 'Data Engineer', 'Bank Analyst']),
+                'company_name': rng.choice(['TechSolutions', 'FinBank', 'HealthPlus', 'Globex']),
+                'job_location': rng.choice(CITIES),
+                'skills_required': rng.sample(SKILLS, rng.randint(0, 6)),
+                'experience_level': rng.choice(LEVELS),
+                'job_requirements': rng.choice(REQUIREMENTS),
+                'salary_range': rng.choice(['', '$80,000 - $120,000'])
+            },
+            'embeddings': rng.choice([None, vector(rng)])
+        }
+        for i in range(jobs)
+    }
+    return resume_docs, job_docs
+
+@pytest.fixture(scope='module')
+def matcher():
+    return AdvancedMatcher()
+
+@pytest.fixture(scope='module')
+def corpus(matcher):
+    resume_docs, job_docs = make_corpus()
+    resumes = {doc_id: matcher.prepare_resume(doc) for doc_id, doc in resume_docs.items()}
+    jobs = {doc_id: matcher.prepare_job(doc) for doc_id, doc in job_docs.items()}
+    return resumes, jobs
+
+def top_k(matcher, resumes, job, limit, min_score, prune):
+    """Top-K (score, id) pairs, pruning against the running K-th best like _rank_hits"""
+    heap = []
+    pruned = 0
+    for doc_id, resume in sorted(resumes.items()):
+        threshold = min_score
+        if prune and len(heap) == limit:
+            threshold = max(min_score, heap[0][0])
+        scores = matcher.score_pair(resume, job, min_score=threshold if prune else None)
+        if scores is None:
+            pruned += 1
+            continue
+        if scores['overall_score'] < min_score:
+            continue
+        entry = (scores['overall_score'], RankTieBreak(doc_id), doc_id)
+        if len(heap) < limit:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+    return [(score, doc_id) for score, _, doc_id in sorted(heap, key=lambda entry: entry[:2], reverse=True)], pruned
+
+@pytest.mark.parametrize('limit, min_score', [(1, 0.0), (5, 0.0), (10, 50.0), (40, 65.0)])
+def test_pruning_leaves_top_k_unchanged(matcher, corpus, limit, min_score):
+    resumes, jobs = corpus
+    total_pruned = 0
+    for job in jobs.values():
+        expected, _ = top_k(matcher, resumes, job, limit, min_score, prune=False)
+        actual, pruned = top_k(matcher, resumes, job, limit, min_score, prune=True)
+        assert actual == expected
+        total_pruned += pruned
+    # The cascade must actually have skipped work for the comparison to mean anything
+    assert total_pruned > 0
+
+def test_components_never_exceed_their_max_score(matcher, corpus):
+    resumes, jobs = corpus
+    for job in jobs.values():
+        for resume in resumes.values():
+            scores = matcher.score_components(resume, job)
+            for component, max_score in matcher.COMPONENT_MAX_SCORES.items():
+                assert scores[component] <= max_score, component
+
+def test_component_max_scores_are_reached(matcher):
+    embedding = [0.3, -0.1, 0.8, 0.2]
+    resume = {
+        'metadata': {
+            'skills': ['Python', 'AWS'],
+            'total_experience_years': 4,
+            'location': 'Pune, India',
+            'experience': [{'company': 'Tech Corp', 'position': 'Software Engineer'}],
+            'education': [{'degree': "Master's in Computer Science"}]
+        },
+        'embeddings': embedding
+    }
+    job = {
+        'metadata': {
+            'job_title': 'Senior Python Developer',
+            'company_name': 'TechSolutions',
+            'job_location': 'Pune, India',
+            'skills_required': ['Python', 'AWS'],
+            'experience_level': '3-6 years',
+            'job_requirements': ["Bachelor's degree in Computer Science"],
+            'salary_range': ''
+        },
+        'embeddings': embedding
+    }
+
+    scores = matcher.score_components(resume, job)
+
+    for component, max_score in matcher.COMPONENT_MAX_SCORES.items():
+        assert scores[component] == pytest.approx(max_score), component
+
+def test_every_weighted_component_has_a_max_score_and_a_cascade_slot(matcher):
+    assert set(matcher.COMPONENT_MAX_SCORES) == set(matcher.weights)
+    assert sorted(matcher.CASCADE_ORDER) == sorted(matcher.weights)
+
+def difflib_ratio(s1, s2):
+    """fuzz.ratio without python-Levenshtein (fuzzywuzzy's SequenceMatcher fallback)"""
+    return int(round(100 * difflib.SequenceMatcher(None, s1, s2).ratio()))
+
+def mutate(rng, skill, edits):
+    """Apply random single-character inserts, deletes, substitutions and swaps"""
+    chars = list(skill)
+    for _ in range(edits):
+        operation = rng.choice('idst')
+        position = rng.randrange(len(chars) + 1)
+        if operation == 'i' or not chars:
+            chars.insert(position, rng.choice('aeiost .-+#'))
+        elif operation == 'd':
+            del chars[min(position, len(chars) - 1)]
+        elif operation == 's':
+            chars[min(position, len(chars) - 1)] = rng.choice('aeiost .-+#')
+        elif len(chars) > 1:
+            position = min(position, len(chars) - 2)
+            chars[position], chars[position + 1] = chars[position + 1], chars[position]
+    return ''.join(chars)
+
+def skill_pairs(seed=11):
+    """Random, near-miss and adversarial (repetitive, periodic, very short) skill string pairs"""
+    rng = random.Random(seed)
+    known = [normalize_skill(skill) for skill in SKILLS] + [
+        skill for skills in SKILL_SYNONYMS.values() for skill in skills
+    ]
+    pairs = []
+    for _ in range(4000):
+        skill = rng.choice(known)
+        pairs.append((skill, mutate(rng, skill, rng.randint(0, 4))))
+    for _ in range(4000):
+        alphabet = rng.choice(['ab', 'abc', 'abcde ', 'aeiost'])
+        pairs.append(tuple(''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 14))) for _ in range(2)))
+    for length in range(1, 16):
+        for other in range(max(1, length - 4), length + 5):
+            pairs.append(('a' * length, 'a' * other))
+            pairs.append((('ab' * length)[:length], ('ba' * other)[:other]))
+            pairs.append((('abc' * length)[:length], ('abc' * other)[:other] + 'x'))
+    return pairs
+
+@pytest.mark.parametrize('scorer', [difflib_ratio, skill_ratio], ids=['difflib', 'skill_ratio'])
+def test_skill_gram_index_has_no_false_negatives(scorer):
+    pairs = skill_pairs()
+    filtered = 0
+    for required, candidate in pairs:
+        index = SkillGramIndex([required])
+        kept = 0 in index.candidates(len(candidate), skill_grams(candidate))
+        if required == candidate or scorer(required, candidate) >= FUZZY_SKILL_MATCH_SCORE:
+            assert kept, (required, candidate, scorer(required, candidate))
+        elif not kept:
+            filtered += 1
+    # The filter has to skip comparisons to be worth having
+    assert filtered > len(pairs) // 4
+
+def test_skill_gram_index_positions_over_many_skills():
+    rng = random.Random(3)
+    required = [normalize_skill(skill) for skill in SKILLS]
+    index = SkillGramIndex(required)
+    for _ in range(2000):
+        candidate = mutate(rng, rng.choice(required), rng.randint(0, 3))
+        expected = {position for position, skill in enumerate(required)
+                    if skill == candidate or skill_ratio(skill, candidate) >= FUZZY_SKILL_MATCH_SCORE}
+        assert expected <= index.candidates(len(candidate), skill_grams(candidate))
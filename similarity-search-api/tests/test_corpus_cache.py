@@ -0,0 +1,90 @@
+"""
+Warm-container corpus cache: LRU eviction by size, invalidation and completeness
+"""
+
+from corpus_cache import CorpusCache
+
+def filled_cache(max_bytes=100, version='v1', sizes=(10, 10, 10)):
+    cache = CorpusCache(max_bytes=max_bytes)
+    cache.validate('resumes', version)
+    for position, size in enumerate(sizes):
+        cache.put('resumes', f'r{position}', {'position': position}, size)
+    return cache
+
+def test_entries_are_only_cached_for_a_validated_index():
+    cache = CorpusCache(max_bytes=100)
+    cache.put('resumes', 'r0', {}, 10)
+
+    assert cache.get('resumes', 'r0') is None
+    assert cache.current_bytes == 0
+
+def test_least_recently_used_entries_are_evicted_by_size():
+    cache = filled_cache(max_bytes=30)
+    cache.get('resumes', 'r0')  # r1 is now the least recently used
+
+    cache.put('resumes', 'r3', {}, 15)
+
+    assert cache.get('resumes', 'r1') is None
+    assert cache.get('resumes', 'r2') is None
+    assert cache.get('resumes', 'r0') == {'position': 0}
+    assert cache.current_bytes == 25
+    assert cache.evictions == 2
+
+def test_entry_larger_than_the_cache_is_not_stored():
+    cache = filled_cache(max_bytes=30)
+    cache.put('resumes', 'big', {}, 31)
+
+    assert cache.get('resumes', 'big') is None
+    assert cache.current_bytes == 30
+
+def test_replacing_an_entry_does_not_double_count_its_size():
+    cache = filled_cache()
+    cache.put('resumes', 'r0', {'position': 'new'}, 20)
+
+    assert cache.current_bytes == 40
+    assert cache.get('resumes', 'r0') == {'position': 'new'}
+
+def test_changed_fingerprint_invalidates_the_index():
+    cache = filled_cache()
+    cache.validate('jobs', 'j1')
+    cache.put('jobs', 'j0', {}, 10)
+
+    assert cache.validate('resumes', 'v1')
+    assert not cache.validate('resumes', 'v2')
+
+    assert cache.get('resumes', 'r0') is None
+    assert cache.get('jobs', 'j0') == {}
+    assert cache.current_bytes == 10
+    assert cache.invalidations == 1
+
+def test_unknown_fingerprint_trusts_nothing():
+    cache = filled_cache()
+
+    assert not cache.validate('resumes', None)
+    assert cache.get('resumes', 'r0') is None
+    cache.put('resumes', 'r0', {}, 10)
+    assert cache.get('resumes', 'r0') is None
+
+def test_complete_flag_requires_every_document_and_resets():
+    cache = filled_cache()
+    cache.mark_complete('resumes', 4)
+    assert not cache.is_complete('resumes')
+
+    cache.mark_complete('resumes', 3)
+    assert cache.is_complete('resumes')
+
+    # An eviction leaves a hole in the index
+    cache.put('resumes', 'r3', {}, 80)
+    assert not cache.is_complete('resumes')
+
+    cache = filled_cache()
+    cache.mark_complete('resumes', 3)
+    cache.validate('resumes', 'v2')
+    assert not cache.is_complete('resumes')
+
+def test_pages_of_a_complete_index():
+    cache = filled_cache(sizes=(1, 1, 1, 1, 1))
+
+    pages = list(cache.iter_pages('resumes', 2))
+
+    assert [[doc_id for doc_id, _ in page] for page in pages] == [['r0', 'r1'], ['r2', 'r3'], ['r4']]
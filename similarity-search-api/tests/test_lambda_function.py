@@ -0,0 +1,108 @@
+"""
+Request handling of the Similarity Search API, against a mocked OpenSearch client
+"""
+
+from lambda_function import BRUTE_FORCE_SIZE
+
+def test_knn_failure_falls_back_visibly(api):
+    def search(index, body):
+        if 'knn' in body['query']:
+            raise RuntimeError('[knn] requires a knn_vector field')
+        return {'hits': {'hits': []}}
+    api.opensearch_client.search.side_effect = search
+
+    hits, mode, knn_error = api._retrieve_candidates('resumes', 'resume', [0.1, 0.2], 50)
+
+    assert hits == []
+    assert mode == 'match_all_fallback'
+    assert 'knn_vector' in knn_error
+    fallback_body = api.opensearch_client.search.call_args.kwargs['body']
+    assert fallback_body['size'] == BRUTE_FORCE_SIZE
+
+def test_knn_retrieval_without_query_vector(api):
+    api.opensearch_client.search.return_value = {'hits': {'hits': []}}
+
+    assert api._retrieve_candidates('resumes', 'resume', None, 50) == ([], 'match_all', None)
+
+RESUME = {
+    'metadata': {
+        'skills': ['Python', 'AWS'],
+        'total_experience_years': 4,
+        'location': 'Pune, India',
+        'experience': [{'company': 'Tech Corp', 'position': 'Software Engineer'}],
+        'education': [{'degree': "Bachelor's in Computer Science"}]
+    }
+}
+JOB = {
+    'metadata': {
+        'job_title': 'Python Developer',
+        'job_location': 'Pune, India',
+        'skills_required': ['Python', 'AWS', 'Docker'],
+        'experience_level': '3-6 years'
+    }
+}
+
+def tied_hits(api, doc_ids):
+    profile = api.matcher.prepare_resume(RESUME)
+    return [{'_id': doc_id, '_source': RESUME, '_profile': profile} for doc_id in doc_ids]
+
+def test_equal_scores_rank_by_id_whatever_the_arrival_order(api):
+    job = api.matcher.prepare_job(JOB)
+    pair_for = lambda profile: (profile, job)
+    doc_ids = ['r7', 'r2', 'r9', 'r4', 'r1']
+
+    forward = api._rank_hits(tied_hits(api, doc_ids), pair_for, 'resume_id', 3, 0.0)
+    backward = api._rank_hits(tied_hits(api, doc_ids[::-1]), pair_for, 'resume_id', 3, 0.0)
+
+    assert [match['resume_id'] for match in forward] == ['r1', 'r2', 'r4']
+    assert [match['resume_id'] for match in backward] == ['r1', 'r2', 'r4']
+
+def test_exhaustive_ranking_does_not_depend_on_page_order(api):
+    job = api.matcher.prepare_job(JOB)
+    score_hits = lambda hits, score_floor=None, stats=None: api._rank_hits(
+        hits, lambda profile: (profile, job), 'resume_id', 2, 0.0, score_floor
+    )
+
+    def ranked(pages):
+        api._stream_index = lambda *args, **kwargs: (page for page in pages)
+        matches, _ = api._exhaustive_top_k('resumes', 'resume', score_hits, 2)
+        return [match['resume_id'] for match in matches]
+
+    assert ranked([tied_hits(api, ['r3', 'r5']), tied_hits(api, ['r1'])]) == ['r1', 'r3']
+    assert ranked([tied_hits(api, ['r1', 'r5']), tied_hits(api, ['r3'])]) == ['r1', 'r3']
+
+def field_mapping(index, field, mapping):
+    leaf = field.rsplit('.', 1)[-1]
+    return {index: {'mappings': {field: {'full_name': field, 'mapping': {leaf: mapping}}}}}
+
+def test_location_filter_unavailable_on_dynamic_geo_location(api):
+    api.opensearch_client.indices.get_field_mapping.return_value = field_mapping(
+        'resumes', 'geo_location', {'properties': {'lat': {'type': 'float'}, 'lon': {'type': 'float'}}}
+    )
+    clause, summary = api._build_location_clause('Pune, India', 50.0)
+
+    assert clause is not None
+    assert not api._location_filter_available('resumes', summary)
+    assert summary['applied'] is False
+    assert summary['reason'].startswith('unavailable')
+
+def test_location_filter_available_on_geo_point(api):
+    api.opensearch_client.indices.get_field_mapping.return_value = field_mapping(
+        'resumes_v2', 'geo_location', {'type': 'geo_point'}
+    )
+    summary = {'applied': True}
+
+    assert api._location_filter_available('resumes', summary)
+    assert api._location_filter_available('resumes', summary)
+    assert summary == {'applied': True}
+    # A confirmed type is cached
+    assert api.opensearch_client.indices.get_field_mapping.call_count == 1
+
+def test_unmapped_or_unreadable_field_is_not_trusted(api):
+    expected = {'geo_location': ('geo_point',)}
+    api.opensearch_client.indices.get_field_mapping.return_value = {'resumes': {'mappings': {}}}
+    assert api._mistyped_fields('resumes', expected) == {'geo_location': 'unmapped'}
+
+    api.opensearch_client.indices.get_field_mapping.side_effect = RuntimeError('forbidden')
+    assert api._mistyped_fields('resumes', expected) == {'geo_location': 'unknown'}
+    assert not api.confirmed_fields
@@ -0,0 +1,168 @@
+"""
+Routing of match runs and the state a worker saves and resumes from
+"""
+
+import copy
+import heapq
+import json
+from unittest import mock
+
+import pytest
+
+import lambda_function
+from lambda_function import MATCH_RUNS_INDEX, MATCH_WORKER_ACTION, RUN_PIT_KEEP_ALIVE, RankTieBreak
+
+BATCH_BODY = {'job_ids': ['j1', 'j2'], 'resume_ids': ['r1', 'r2'], 'limit': 5}
+
+@pytest.fixture
+def routed():
+    """The global API instance, replaced by a mock that records which endpoint ran"""
+    with mock.patch.object(lambda_function, 'api_instance') as instance:
+        yield instance
+
+def test_proxy_match_jobs_starts_a_run(routed):
+    event = {'resource': '/match/jobs', 'httpMethod': 'POST', 'path': '/match/jobs', 'body': json.dumps(BATCH_BODY)}
+
+    lambda_function.lambda_handler(event, None)
+
+    routed.start_match_run.assert_called_once_with(BATCH_BODY, None)
+    routed.batch_match.assert_not_called()
+
+def test_http_api_match_jobs_starts_a_run(routed):
+    event = {
+        'version': '2.0', 'rawPath': '/match/jobs', 'body': json.dumps(BATCH_BODY),
+        'requestContext': {'http': {'method': 'POST', 'path': '/match/jobs'}}
+    }
+
+    lambda_function.lambda_handler(event, None)
+
+    routed.start_match_run.assert_called_once_with(BATCH_BODY, None)
+    routed.batch_match.assert_not_called()
+
+def test_proxy_match_batch_runs_synchronously(routed):
+    event = {'resource': '/match/batch', 'httpMethod': 'POST', 'path': '/match/batch', 'body': json.dumps(BATCH_BODY)}
+
+    lambda_function.lambda_handler(event, None)
+
+    routed.batch_match.assert_called_once_with(BATCH_BODY, None)
+    routed.start_match_run.assert_not_called()
+
+def test_bare_batch_body_is_not_guessed(routed):
+    response = lambda_function.lambda_handler(dict(BATCH_BODY), None)
+
+    assert response['statusCode'] == 404
+    routed.batch_match.assert_not_called()
+    routed.start_match_run.assert_not_called()
+
+def test_worker_payload_runs_the_match_job(routed, api):
+    api.lambda_client = mock.MagicMock()
+    context = mock.Mock(function_name='similarity-search')
+    api._invoke_worker('run-1', context)
+    payload = json.loads(api.lambda_client.invoke.call_args.kwargs['Payload'])
+
+    lambda_function.lambda_handler(payload, context)
+
+    assert payload['action'] == MATCH_WORKER_ACTION
+    routed.run_match_job.assert_called_once_with('run-1', context)
+
+def test_request_body_cannot_trigger_the_worker(routed):
+    body = {'action': MATCH_WORKER_ACTION, 'run_id': 'run-1'}
+    event = {'resource': '/match/batch', 'httpMethod': 'POST', 'path': '/match/batch', 'body': json.dumps(body)}
+
+    lambda_function.lambda_handler(event, None)
+
+    routed.run_match_job.assert_not_called()
+
+def heap_entry(resume_id, score):
+    match = {'resume_id': resume_id, 'score': score, 'component_scores': {'skills_score': score},
+             '_source': {'metadata': {'name': resume_id}}}
+    return (score, RankTieBreak(resume_id), match)
+
+def job_query(job_id, entries):
+    heap = list(entries)
+    heapq.heapify(heap)
+    return {'id': job_id, 'source': {'metadata': {'job_title': f'Title {job_id}'}}, 'heap': heap}
+
+def test_save_run_stores_best_first_results_without_display_fields(api):
+    api.opensearch_client.indices.exists.return_value = False
+    roles = api._batch_roles(['j1'], [])
+    run = {'run_id': 'run-1', 'results': []}
+    queries = [job_query('j1', [heap_entry('r3', 70.0), heap_entry('r1', 90.0), heap_entry('r2', 70.0)])]
+
+    api._save_run(run, queries, roles)
+    api._save_run(run, queries, roles)
+
+    api.opensearch_client.indices.create.assert_called_once()
+    assert api.opensearch_client.index.call_args.kwargs['index'] == MATCH_RUNS_INDEX
+    assert api.opensearch_client.index.call_args.kwargs['id'] == 'run-1'
+    assert run['results'] == [{
+        'job_id': 'j1',
+        'job_title': 'Title j1',
+        'matches': [
+            {'resume_id': 'r1', 'score': 90.0, 'component_scores': {'skills_score': 90.0}},
+            {'resume_id': 'r2', 'score': 70.0, 'component_scores': {'skills_score': 70.0}},
+            {'resume_id': 'r3', 'score': 70.0, 'component_scores': {'skills_score': 70.0}}
+        ]
+    }]
+
+def test_restored_heaps_continue_like_the_saved_ones(api):
+    roles = api._batch_roles(['j1', 'j2'], [])
+    run = {'run_id': 'run-1', 'results': []}
+    saved = [job_query('j1', [heap_entry('r1', 90.0), heap_entry('r2', 70.0)]), job_query('j2', [])]
+    api._save_run(run, saved, roles)
+
+    restored = [job_query('j1', []), job_query('j2', []), job_query('j3', [])]
+    api._restore_heaps(restored, copy.deepcopy(run['results']), roles['query_field'], roles['id_field'])
+
+    # The weakest match is at the root, where the next page's candidates are compared
+    assert [entry[:2] for entry in restored[0]['heap']] == [entry[:2] for entry in saved[0]['heap']]
+    assert restored[0]['heap'][0][:2] == (70.0, RankTieBreak('r2'))
+    assert restored[1]['heap'] == [] and restored[2]['heap'] == []
+
+def test_id_cursor_resumes_after_the_last_scanned_id(api):
+    api._load_candidates = mock.Mock(side_effect=lambda index, document_type, ids: ids)
+    candidate_ids = ['r1', 'r2', 'r3', 'r4']
+    cursor = api._run_cursor('resumes', candidate_ids)
+    assert cursor == {'after_id': None}
+    api.opensearch_client.create_pit.assert_not_called()
+
+    cursor['after_id'] = 'r2'  # saved by an earlier invocation
+    assert list(api._candidate_pages('resumes', 'resume', candidate_ids, cursor=cursor)) == [['r3', 'r4']]
+    assert cursor == {'after_id': 'r4'}
+    assert list(api._candidate_pages('resumes', 'resume', candidate_ids, cursor=cursor)) == []
+
+def test_index_cursor_is_one_snapshot_across_invocations(api):
+    api.opensearch_client.create_pit.return_value = {'pit_id': 'pit-1'}
+
+    cursor = api._run_cursor('resumes', [])
+
+    api.opensearch_client.create_pit.assert_called_once_with(index='resumes', params={'keep_alive': RUN_PIT_KEEP_ALIVE})
+    assert cursor == {'pit_id': 'pit-1', 'keep_alive': RUN_PIT_KEEP_ALIVE, 'search_after': None}
+
+    api._stream_index = mock.Mock(return_value=iter([]))
+    list(api._candidate_pages('resumes', 'resume', [], cursor=cursor))
+    assert api._stream_index.call_args.kwargs['snapshot'] is cursor
+
+def test_continued_run_walks_from_its_saved_cursor(api):
+    cursor = {'pit_id': 'pit-1', 'keep_alive': RUN_PIT_KEEP_ALIVE, 'search_after': [4, 17]}
+    run = {
+        'run_id': 'run-1', 'status': 'running',
+        'request': {'job_ids': ['j1'], 'resume_ids': [], 'limit': 5, 'min_score': 50.0},
+        'progress': {'documents_scanned': 40, 'documents_total': 100, 'invocations': 1},
+        'cursor': cursor, 'results': [], 'not_found': [],
+        'scoring_stats': {'candidates_scored': 40, 'candidates_pruned': 0}, 'error': None
+    }
+    api._get_run = mock.Mock(return_value=run)
+    api._load_queries = mock.Mock(return_value=([job_query('j1', [])], []))
+    api._sync_corpus_cache = mock.Mock()
+    api._save_run = mock.Mock()
+
+    def stream(index_name, document_type, snapshot=None):
+        assert snapshot == {'pit_id': 'pit-1', 'keep_alive': RUN_PIT_KEEP_ALIVE, 'search_after': [4, 17]}
+        yield from ()
+    api._stream_index = mock.Mock(side_effect=stream)
+
+    assert api.run_match_job('run-1')['status'] == 'completed'
+    api.opensearch_client.create_pit.assert_not_called()
+    api._stream_index.assert_called_once()
+    assert run['progress']['invocations'] == 2
@@ -0,0 +1,188 @@
+"""
+Parity of the server-side scoring mirror with the Python matcher, and the
+contract between the stored script, its params and the resume mapping
+
+Fixture documents carry the fields the processors write at ingest, so
+mirror_score reads exactly what the stored script reads on the cluster.
+"""
+
+import json
+import re
+
+import pytest
+
+from advanced_matcher import AdvancedMatcher
+from document_features import canonicalize_skills, job_features, resume_features
+from gazetteer import location_features
+from server_scoring import (
+    SCORE_ROUNDING_TOLERANCE, SCRIPT_FIELD_TYPES, SCRIPT_FIELDS, SCRIPT_ID, SCRIPT_SOURCE, fuzzy_match_tolerance,
+    mirror_score, script_params
+)
+
+def resume_source(embeddings=None, **metadata):
+    """A resume `_source` as written by the resume processor"""
+    return {
+        'metadata': metadata,
+        'canonical_skills': canonicalize_skills(metadata.get('skills', [])),
+        **location_features(metadata.get('location')),
+        **resume_features(metadata),
+        'embeddings': embeddings
+    }
+
+def job_source(embeddings=None, **metadata):
+    """A job description `_source` as written by the job description processor"""
+    return {
+        'metadata': metadata,
+        'canonical_skills': canonicalize_skills(metadata.get('skills_required', [])),
+        **job_features(metadata),
+        'embeddings': embeddings
+    }
+
+JOB = job_source(
+    embeddings=[0.2, 0.1, 0.7, 0.3],
+    job_title='Senior Python Developer',
+    company_name='TechSolutions',
+    job_location='Pune, India',
+    skills_required=['Python', 'AWS', 'Docker', 'SQL'],
+    experience_level='3-6 years',
+    job_requirements=["Bachelor's degree in Computer Science"],
+    salary_range='$80,000 - $120,000'
+)
+
+# Scored without fuzzy matches: skills match exactly or by synonym
+EXACT_PAIRS = {
+    'exact skills, same city': resume_source(
+        embeddings=[0.25, 0.1, 0.6, 0.35],
+        skills=['Python', 'AWS', 'Docker', 'SQL'],
+        total_experience_years=5,
+        location='Pune, India',
+        experience=[{'company': 'Tech Corp', 'position': 'Software Engineer'}],
+        education=[{'degree': "Bachelor's in Computer Science"}]
+    ),
+    'synonyms, same region': resume_source(
+        embeddings=[0.9, -0.2, 0.1, 0.0],
+        skills=['Django', 'Lambda', 'Kubernetes', 'PostgreSQL'],
+        total_experience_years=2,
+        location='Mumbai, India',
+        experience=[{'company': 'BankCo', 'position': 'Analyst'}],
+        education=[{'degree': 'Master of Technology'}]
+    ),
+    'remote, overqualified': resume_source(
+        embeddings=[0.1, 0.1, 0.1, 0.1],
+        skills=['Python', 'Java'],
+        total_experience_years=12,
+        location='Remote',
+        experience=[{'company': 'MediHealth', 'position': 'Data Scientist'}],
+        education=[{'degree': 'PhD in Physics'}]
+    ),
+    'sparse resume, distance band': resume_source(
+        skills=['Git'],
+        total_experience_years=0,
+        location='Thane'
+    ),
+}
+
+# Credited by the matcher's fuzzy skill match only ('terraforms' ~ 'terraform')
+FUZZY_JOB = job_source(
+    job_title='Platform Engineer',
+    company_name='Globex',
+    job_location='Delhi, India',
+    skills_required=['Terraform', 'Docker'],
+    experience_level='Mid-level'
+)
+FUZZY_RESUME = resume_source(
+    skills=['Terraforms', 'Docker'],
+    total_experience_years=4,
+    location='Delhi, India',
+    experience=[{'company': 'Acme', 'position': 'Software Engineer'}],
+    education=[{'degree': 'B.Tech'}]
+)
+
+@pytest.fixture(scope='module')
+def matcher():
+    return AdvancedMatcher()
+
+@pytest.mark.parametrize('name', list(EXACT_PAIRS))
+def test_mirror_matches_matcher_without_fuzzy_matches(matcher, name):
+    resume = EXACT_PAIRS[name]
+    python_score = matcher.score_pair(resume, JOB)['overall_score']
+    server_score = mirror_score(script_params(matcher, JOB), resume)
+
+    assert server_score == pytest.approx(python_score, abs=SCORE_ROUNDING_TOLERANCE)
+
+def test_mirror_stays_within_fuzzy_match_tolerance(matcher):
+    python_score = matcher.score_pair(FUZZY_RESUME, FUZZY_JOB)['overall_score']
+    server_score = mirror_score(script_params(matcher, FUZZY_JOB), FUZZY_RESUME)
+
+    # The fuzzy credit is the only difference, and the mirror never scores higher
+    assert python_score - server_score > SCORE_ROUNDING_TOLERANCE
+    assert python_score - server_score <= fuzzy_match_tolerance(matcher.weights)
+
+def test_script_reads_exactly_the_script_fields():
+    assert set(re.findall(r"doc\['([\w.]+)'\]", SCRIPT_SOURCE)) == set(SCRIPT_FIELDS)
+
+def test_script_fields_are_written_at_ingest():
+    resume = EXACT_PAIRS['exact skills, same city']
+    for field in SCRIPT_FIELDS:
+        value = resume
+        for part in field.split('.'):
+            value = value[part]
+        assert value is not None, field
+
+def test_script_params_cover_the_script(matcher):
+    params = script_params(matcher, JOB)
+
+    assert set(re.findall(r'params\.(\w+)', SCRIPT_SOURCE)) == set(params)
+    assert set(re.findall(r'weights\.(\w+)', SCRIPT_SOURCE)) == set(params['weights'])
+    # Params travel in the request body
+    assert json.loads(json.dumps(params)) == params
+
+def test_server_top_k_query(api):
+    api.opensearch_client.search.return_value = {
+        'hits': {'total': {'value': 2}, 'hits': [{'_id': 'r1', '_score': 81.234, '_source': {}}]}
+    }
+    params = script_params(api.matcher, JOB)
+    filters = [{'term': {'is_remote': True}}]
+
+    matches, retrieval, scored = api._server_top_k('resumes', params, 5, 60.0, filters)
+    api._server_top_k('resumes', params, 5, 60.0)
+
+    api.opensearch_client.put_script.assert_called_once_with(
+        id=SCRIPT_ID, body={'script': {'lang': 'painless', 'source': SCRIPT_SOURCE}}
+    )
+    filtered, unfiltered = [call.kwargs for call in api.opensearch_client.search.call_args_list]
+    script_score = filtered['body']['query']['script_score']
+    assert filtered['index'] == 'resumes'
+    assert script_score['script'] == {'id': SCRIPT_ID, 'params': params}
+    assert script_score['query'] == {'bool': {'filter': filters}}
+    assert unfiltered['body']['query']['script_score']['query'] == {'match_all': {}}
+    assert (filtered['body']['size'], filtered['body']['min_score']) == (5, 60.0)
+    assert matches == [{'resume_id': 'r1', 'score': 81.23, '_source': {}}]
+    assert (retrieval['mode'], scored) == ('script_score', 2)
+
+def mapping_response(field_types):
+    return {'resumes': {'mappings': {
+        field: {'full_name': field, 'mapping': {field.rsplit('.', 1)[-1]: {'type': field_type}}}
+        for field, field_type in field_types.items()
+    }}}
+
+def test_server_scoring_rejected_without_knn_vector(api):
+    field_types = {field: types[0] for field, types in SCRIPT_FIELD_TYPES.items()}
+    field_types['embeddings'] = 'float'
+    api.opensearch_client.indices.get_field_mapping.return_value = mapping_response(field_types)
+
+    response = api.search_resumes_for_job({'job_id': 'j1', 'scoring': 'server'})
+
+    assert response['statusCode'] == 409
+    assert json.loads(response['body'])['mistyped_fields'] == {'embeddings': 'float'}
+    api.opensearch_client.search.assert_not_called()
+    api.opensearch_client.put_script.assert_not_called()
+
+def test_server_scoring_mapping_confirmed_once(api):
+    api.opensearch_client.indices.get_field_mapping.return_value = mapping_response(
+        {field: types[0] for field, types in SCRIPT_FIELD_TYPES.items()}
+    )
+
+    assert api._mistyped_fields('resumes', SCRIPT_FIELD_TYPES) == {}
+    assert api._mistyped_fields('resumes', SCRIPT_FIELD_TYPES) == {}
+    assert api.opensearch_client.indices.get_field_mapping.call_count == 1